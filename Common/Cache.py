@@ -0,0 +1,199 @@
+import hashlib
+import json
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+
+def canonical_key(*parts):
+    """
+    :return: A stable hash of JSON serialisable parts, independent of dict ordering
+    """
+    text = json.dumps(parts, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class DiskStore:
+    """
+    Second cache tier shared by every worker on the host, one pickle file per key.
+    Files older than max_age are deleted, and the oldest files beyond max_files,
+    by a sweep that runs every few puts.
+    """
+    def __init__(self, dir_name, max_files, max_age=None):
+        """
+        :param max_files: Most files kept in dir_name
+        :param max_age: Seconds after which a file is deleted, None keeps files until pruned by count
+        """
+        self._dir_name = dir_name
+        self._max_files = max_files
+        self._max_age = max_age
+        # Sweeping lists the directory, so only do it once per tenth of max_files puts
+        self._sweep_every = max(1, max_files // 10)
+        self._puts = 0
+        self._lock = threading.Lock()
+        if not os.path.exists(dir_name):
+            os.makedirs(dir_name, exist_ok=True)
+        self.sweep()
+
+    def get(self, key):
+        """
+        :return: (expires_at, value) or None
+        """
+        try:
+            with open(self._file_name(key), "rb") as in_file:
+                return pickle.load(in_file)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+
+    def put(self, key, expires_at, value):
+        # Write then rename so other workers never read a partial file
+        file_name = self._file_name(key)
+        tmp_name = f"{file_name}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_name, "wb") as out_file:
+            pickle.dump((expires_at, value), out_file)
+        os.replace(tmp_name, file_name)
+
+        with self._lock:
+            self._puts += 1
+            sweep = self._puts % self._sweep_every == 0
+        if sweep:
+            self.sweep()
+
+    def remove(self, key):
+        self._remove_file(self._file_name(key))
+
+    def clear(self):
+        for name in os.listdir(self._dir_name):
+            if name.endswith(".p"):
+                self._remove_file(os.path.join(self._dir_name, name))
+
+    def sweep(self):
+        """
+        Delete files older than max_age, then the oldest files beyond max_files.
+        """
+        files = []
+        for entry in os.scandir(self._dir_name):
+            try:
+                if entry.name.endswith(".p"):
+                    files.append((entry.stat().st_mtime, entry.path))
+            except OSError:
+                # Removed by another worker
+                pass
+        files.sort()
+
+        expired = 0
+        if self._max_age is not None:
+            oldest_kept = time.time() - self._max_age
+            while expired < len(files) and files[expired][0] < oldest_kept:
+                expired += 1
+        for _, file_name in files[:max(expired, len(files) - self._max_files)]:
+            self._remove_file(file_name)
+
+    @staticmethod
+    def _remove_file(file_name):
+        try:
+            os.remove(file_name)
+        except FileNotFoundError:
+            pass
+
+    def _file_name(self, key):
+        return os.path.join(self._dir_name, f"{key}.p")
+
+
+class LRUCache:
+    """
+    Thread safe, size bounded cache.  Entries expire ttl seconds after they
+    were stored, the least recently used entry is evicted when full.  An
+    optional DiskStore is checked on a miss and written on every put.
+    """
+    def __init__(self, max_size, ttl, store: DiskStore = None, clock=time.time, size_of=None):
+        """
+        :param size_of: Estimates the bytes a value uses, to report the memory the cache holds
+        """
+        self._max_size = max_size
+        self._ttl = ttl
+        self._store = store
+        self._clock = clock
+        self._size_of = size_of
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._hits = 0
+        self._disk_hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def get(self, key):
+        """
+        :return: The cached value, None on a miss
+        """
+        now = self._clock()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+                self._hits += 1
+                return entry[1]
+            if entry is not None:
+                self._remove(key)
+
+        entry = self._store.get(key) if self._store is not None else None
+        if entry is not None and entry[0] <= now:
+            self._store.remove(key)
+            entry = None
+        with self._lock:
+            if entry is not None:
+                self._insert(key, entry)
+                self._disk_hits += 1
+                return entry[1]
+            self._misses += 1
+            return None
+
+    def put(self, key, value):
+        if self._max_size <= 0:
+            return
+        entry = (self._clock() + self._ttl, value)
+        with self._lock:
+            self._insert(key, entry)
+        if self._store is not None:
+            self._store.put(key, *entry)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+        if self._store is not None:
+            self._store.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self._hits + self._disk_hits + self._misses
+            stats = {
+                "size": len(self._entries),
+                "max_size": self._max_size,
+                "hits": self._hits,
+                "disk_hits": self._disk_hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+                "hit_rate": (self._hits + self._disk_hits) / lookups if lookups > 0 else 0.0
+            }
+            if self._size_of is not None:
+                stats["bytes"] = self._bytes
+            return stats
+
+    def _insert(self, key, entry):
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = entry
+        if self._size_of is not None:
+            self._bytes += self._size_of(entry[1])
+        while len(self._entries) > self._max_size:
+            self._remove(next(iter(self._entries)))
+            self._evictions += 1
+
+    def _remove(self, key):
+        _, value = self._entries.pop(key)
+        if self._size_of is not None:
+            self._bytes -= self._size_of(value)
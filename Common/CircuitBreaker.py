@@ -0,0 +1,72 @@
+import threading
+import time
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+class CircuitBreaker:
+    """
+    Stops calling a failing dependency.  After failure_threshold consecutive
+    failures the breaker opens and calls are rejected without being tried.
+    Once reset_timeout seconds have passed a single probe call is let through
+    (half open), its result closes or re-opens the breaker.
+    """
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold, reset_timeout, clock=time.monotonic):
+        self._failure_threshold = failure_threshold
+        self._reset_timeout = reset_timeout
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trips = 0
+        self._rejected = 0
+
+    def allow(self):
+        with self._lock:
+            if self._state == self.OPEN and self._clock() - self._opened_at >= self._reset_timeout:
+                # Let this call through as the probe, reject the rest until it reports back
+                self._state = self.HALF_OPEN
+                return True
+            if self._state == self.CLOSED:
+                return True
+            self._rejected += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._state == self.HALF_OPEN or self._failures >= self._failure_threshold:
+                if self._state != self.OPEN:
+                    self._trips += 1
+                self._state = self.OPEN
+                self._opened_at = self._clock()
+
+    def record_skipped(self):
+        """
+        The call was never made, e.g. no client was free.  Counts as neither a
+        success nor a failure, a probe that was skipped leaves the next call to probe.
+        """
+        with self._lock:
+            if self._state == self.HALF_OPEN:
+                self._state = self.OPEN
+
+    def status(self):
+        with self._lock:
+            return {
+                "state": self._state,
+                "consecutive_failures": self._failures,
+                "trips": self._trips,
+                "rejected": self._rejected
+            }
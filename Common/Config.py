@@ -8,6 +8,30 @@ def get_config():
 class Config:
     def __init__(self):
         self.FILE_TAG = None
+        self.LCA_PORT = None
+        self.LCA_POOL_SIZE = None
+        self.LCA_POOL_TIMEOUT = None
+        self.LCA_HEALTH_CHECK_SECS = None
+        self.LCA_REFERENCE_TTL_SECS = None
+        self.LCA_MODE = None
+        self.LCA_BACKEND = None
+        self.CO2_CACHE_SIZE = None
+        self.CO2_CACHE_TTL_SECS = None
+        self.CO2_CACHE_DIR = None
+        self.CO2_CACHE_DIR_FILES = None
+        self.BERT_BATCH_SIZE = None
+        self.BERT_BATCH_WAIT_MS = None
+        self.BERT_BACKEND = None
+        self.BERT_THREADS = None
+        self.BERT_CACHE_SIZE = None
+        self.BERT_CACHE_TTL_SECS = None
+        self.BERT_CACHE_DIR = None
+        self.BERT_CACHE_DIR_FILES = None
+        self.LCA_FACTOR_FILE = None
+        self.LCA_TIMEOUT_SECS = None
+        self.REQUEST_DEADLINE_SECS = None
+        self.LCA_BREAKER_FAILURES = None
+        self.LCA_BREAKER_RESET_SECS = None
         self.config()
 
     def config(self):
@@ -15,3 +39,49 @@ class Config:
             self.FILE_TAG = os.environ["FILE_TAG"]
         else:
             self.FILE_TAG = "ajp"
+
+        # openLCA IPC server
+        self.LCA_PORT = int(os.environ.get("LCA_PORT", 8080))
+        self.LCA_POOL_SIZE = int(os.environ.get("LCA_POOL_SIZE", 2))
+        self.LCA_POOL_TIMEOUT = float(os.environ.get("LCA_POOL_TIMEOUT", 10.0))
+        self.LCA_HEALTH_CHECK_SECS = float(os.environ.get("LCA_HEALTH_CHECK_SECS", 60.0))
+        self.LCA_REFERENCE_TTL_SECS = float(os.environ.get("LCA_REFERENCE_TTL_SECS", 3600.0))
+
+        # 'calculate' runs openLCA for every request, 'linear' scales a cached per unit factor
+        self.LCA_MODE = os.environ.get("LCA_MODE", "calculate")
+        self.LCA_FACTOR_FILE = os.environ.get("LCA_FACTOR_FILE", "models/lca_factors.json")
+        # 'openlca' talks to the openLCA IPC server, 'local' only reads the factor file
+        self.LCA_BACKEND = os.environ.get("LCA_BACKEND", "openlca")
+
+        # CO2 results of recently seen projects, 0 entries disables the cache, no dir keeps it in memory only
+        self.CO2_CACHE_SIZE = int(os.environ.get("CO2_CACHE_SIZE", 1024))
+        self.CO2_CACHE_TTL_SECS = float(os.environ.get("CO2_CACHE_TTL_SECS", 3600.0))
+        self.CO2_CACHE_DIR = os.environ.get("CO2_CACHE_DIR", "")
+        # Most result files kept in the dir, the oldest are deleted beyond that
+        self.CO2_CACHE_DIR_FILES = int(os.environ.get("CO2_CACHE_DIR_FILES", 65536))
+
+        # Concurrent description predictions share one BERT forward pass of up to this many sentences
+        self.BERT_BATCH_SIZE = int(os.environ.get("BERT_BATCH_SIZE", 16))
+        self.BERT_BATCH_WAIT_MS = float(os.environ.get("BERT_BATCH_WAIT_MS", 5.0))
+
+        # 'fp32' serves the model as trained, 'int8' quantizes it at load time for faster CPU inference,
+        # 'onnx' and 'onnx-int8' serve the exported ONNX model with ONNX Runtime,
+        # 'torchscript' serves a traced copy of the model
+        self.BERT_BACKEND = os.environ.get("BERT_BACKEND", "fp32")
+        # Threads each worker's model uses within an operation, 0 uses every core.
+        # With several gunicorn workers, cores / workers avoids oversubscribing the CPU.
+        self.BERT_THREADS = int(os.environ.get("BERT_THREADS", 0))
+
+        # Sector probabilities of recently seen descriptions, a dir shares them between workers
+        self.BERT_CACHE_SIZE = int(os.environ.get("BERT_CACHE_SIZE", 4096))
+        self.BERT_CACHE_TTL_SECS = float(os.environ.get("BERT_CACHE_TTL_SECS", 86400.0))
+        self.BERT_CACHE_DIR = os.environ.get("BERT_CACHE_DIR", "")
+        self.BERT_CACHE_DIR_FILES = int(os.environ.get("BERT_CACHE_DIR_FILES", 65536))
+
+        # Longest wait for one LCA call, and for everything a request does
+        self.LCA_TIMEOUT_SECS = float(os.environ.get("LCA_TIMEOUT_SECS", 10.0))
+        self.REQUEST_DEADLINE_SECS = float(os.environ.get("REQUEST_DEADLINE_SECS", 25.0))
+
+        # Stop calling the LCA system after this many failures in a row, probe again after the reset time
+        self.LCA_BREAKER_FAILURES = int(os.environ.get("LCA_BREAKER_FAILURES", 5))
+        self.LCA_BREAKER_RESET_SECS = float(os.environ.get("LCA_BREAKER_RESET_SECS", 30.0))
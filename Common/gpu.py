@@ -2,19 +2,12 @@ import os
 import torch
 
 
-def check_for_GPU():
-    # Get the GPU device name.
-    try:
-        import tensorflow as tf
-        device_name = tf.test.gpu_device_name()
-    except:
-        device_name = "/device:CPU:0"
-
-    if device_name == '/device:GPU:0':
-        print('Found GPU at: {}'.format(device_name))
-    else:
-        print("No GPU found, using CPU")
-
+def check_for_GPU(tf_strategy=False):
+    """
+    :param tf_strategy: Also pick a tensorflow distribution strategy.  Importing tensorflow
+                        takes seconds, so it's only done when a strategy is asked for.
+    :return: The torch device and the tensorflow strategy, None unless tf_strategy
+    """
     # If there's a GPU available...
     # Don't actually use the TF device since we don't know which backend torch
     # may use
@@ -27,6 +20,21 @@ def check_for_GPU():
         print('No GPU available, using the CPU instead.')
         device = torch.device("cpu")
 
+    if not tf_strategy:
+        return device, None
+
+    # Get the GPU device name.
+    try:
+        import tensorflow as tf
+        device_name = tf.test.gpu_device_name()
+    except:
+        device_name = "/device:CPU:0"
+
+    if device_name == '/device:GPU:0':
+        print('Found GPU at: {}'.format(device_name))
+    else:
+        print("No GPU found, using CPU")
+
     # Determine run environment
     if 'COLAB_TPU_ADDR' in os.environ and os.environ['COLAB_TPU_ADDR']:
         strategy = _get_tpu_strategy()
@@ -41,6 +41,14 @@ class PredictorController:
         self.pp = project_predictor
         self.ip = impact_predictor
 
+    def get_health(self):
+        response_body = {
+            "Status": "Healthy"
+        }
+        response_body.update(self.pp.get_status())
+        response_body.update(self.ip.get_status())
+        return jsonify(response_body), 200
+
     def get_sector_list(self):
         self.logger.info("get_sector_list:")
         return jsonify(ProjectType.sector_list()), 200
@@ -79,3 +87,72 @@ class PredictorController:
             response_status = 400
             response_body = project
         return jsonify(response_body), response_status
+
+    @verify_json_request
+    def get_impact_from_projects(self, json_request):
+        self.logger.info("get_impact_from_projects:")
+        if not isinstance(json_request, list):
+            response_body = {
+                'ErrorMsg': 'Request body must be a list of projects.'
+            }
+            return jsonify(response_body), 400
+
+        # Build every project, then score each project type in one pass
+        results = [None] * len(json_request)
+        by_type = {}
+        for idx, project_json in enumerate(json_request):
+            ok, project = self._build_project(project_json)
+            if ok:
+                by_type.setdefault(type(project), []).append((idx, project))
+            else:
+                results[idx] = {'ErrorMsg': project}
+
+        deadline = self.ip.request_deadline()
+        for indexed_projects in by_type.values():
+            for idx, result in zip([idx for idx, _ in indexed_projects],
+                                   self._score_projects([p for _, p in indexed_projects], deadline)):
+                results[idx] = result
+
+        response_body = {
+            'Results': results
+        }
+        return jsonify(response_body), 200
+
+    def _build_project(self, project_json):
+        if not isinstance(project_json, dict):
+            return False, 'Each project must be a JSON object.'
+        try:
+            return self.pb.from_json(project_json)
+        except Exception as e:
+            # e.g. a parameter that isn't a number, only this project fails
+            self.logger.warn(f"Cannot build project {project_json}: {e}")
+            return False, f'Invalid project parameters: {e}'
+
+    def _score_projects(self, projects, deadline):
+        """
+        :param projects: Projects that are all of the same type
+        :return: A result for each project, in order
+        """
+        try:
+            impacts = self.ip.get_co2_batch(projects, deadline)
+            return [self._impact_result(project, impact) for project, impact in zip(projects, impacts)]
+        except Exception as e:
+            # One bad project spoils the whole batch, score them one at a time to find it
+            self.logger.warn(f"Cannot score {len(projects)} projects together, scoring each: {e}")
+
+        results = []
+        for project in projects:
+            try:
+                results.append(self._impact_result(project, self.ip.get_co2(project, deadline)))
+            except Exception as e:
+                results.append({'ErrorMsg': f'Cannot calculate CO2 for project: {e}'})
+        return results
+
+    @staticmethod
+    def _impact_result(project, impact):
+        ok_a, ok_b, co2_a, co2_b = impact
+        return {
+            'Project': project.to_json(),
+            'CO2 Method 1': co2_a,
+            'CO2 Method 2': co2_b
+        }
@@ -0,0 +1,151 @@
+import threading
+import time
+from collections import deque
+import numpy as np
+import torch
+
+from Common.Logger import Logger
+
+
+class Histogram:
+    """
+    Counts of observed values in power of two buckets: 1, 2, 4, ... and everything above the last bound.
+    """
+    def __init__(self, max_bound):
+        self._bounds = []
+        bound = 1
+        while bound < max_bound:
+            self._bounds.append(bound)
+            bound *= 2
+        self._bounds.append(bound)
+        self._counts = [0] * (len(self._bounds) + 1)
+
+    def add(self, value):
+        for idx, bound in enumerate(self._bounds):
+            if value <= bound:
+                self._counts[idx] += 1
+                return
+        self._counts[-1] += 1
+
+    def to_json(self):
+        buckets = {f"<={bound}": count for bound, count in zip(self._bounds, self._counts)}
+        buckets[f">{self._bounds[-1]}"] = self._counts[-1]
+        return buckets
+
+
+class _Request:
+    def __init__(self, input_ids, input_mask):
+        self.input_ids = input_ids
+        self.input_mask = input_mask
+        self.done = threading.Event()
+        self.logits = None
+        self.error = None
+
+
+class BatchingPredictor:
+    """
+    Sits in front of CBert.predict.  Concurrent callers are queued and a
+    single worker thread runs them together: it waits up to max_wait_ms for
+    up to max_batch_size sentences, pads them to the longest one, runs one
+    forward pass and hands each caller back its own rows of logits.
+    """
+    def __init__(self, logger: Logger, cbert, max_batch_size, max_wait_ms, pad_token_id=0):
+        self._lgr = logger
+        self._cbert = cbert
+        self._max_batch_size = max(1, max_batch_size)
+        self._max_wait = max_wait_ms / 1000.0
+        self._pad_token_id = pad_token_id
+        self._queue = deque()
+        self._cond = threading.Condition()
+        self._worker = None
+        self._batch_sizes = Histogram(self._max_batch_size)
+        self._queue_depths = Histogram(4 * self._max_batch_size)
+        self._num_batches = 0
+
+    def predict(self, input_ids, input_mask):
+        """
+        Same contract as CBert.predict, blocks until this caller's rows are done.
+        :return: numpy array of logits, one row per sentence
+        """
+        request = _Request(input_ids, input_mask)
+        with self._cond:
+            # Started on first use so the thread is created in the worker process, not before a fork
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name="bert-batcher", daemon=True)
+                self._worker.start()
+            self._queue.append(request)
+            self._cond.notify()
+
+        request.done.wait()
+        if request.error is not None:
+            raise request.error
+        return request.logits
+
+    def get_status(self):
+        with self._cond:
+            return {
+                "batches": self._num_batches,
+                "queue_depth": len(self._queue),
+                "batch_size_histogram": self._batch_sizes.to_json(),
+                "queue_depth_histogram": self._queue_depths.to_json()
+            }
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            try:
+                logits = self._predict_batch(batch)
+                start = 0
+                for request in batch:
+                    end = start + request.input_ids.shape[0]
+                    request.logits = logits[start:end]
+                    start = end
+            except Exception as e:
+                self._lgr.error(f"Batched prediction failed: {e}")
+                for request in batch:
+                    request.error = e
+            for request in batch:
+                request.done.set()
+
+    def _next_batch(self):
+        with self._cond:
+            while len(self._queue) == 0:
+                self._cond.wait()
+            self._queue_depths.add(len(self._queue))
+
+            # Hold the first request for at most max_wait while others arrive
+            deadline = time.monotonic() + self._max_wait
+            while self._queued_rows() < self._max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+
+            batch = [self._queue.popleft()]
+            num_rows = batch[0].input_ids.shape[0]
+            while len(self._queue) > 0 and num_rows + self._queue[0].input_ids.shape[0] <= self._max_batch_size:
+                request = self._queue.popleft()
+                num_rows += request.input_ids.shape[0]
+                batch.append(request)
+
+            self._batch_sizes.add(num_rows)
+            self._num_batches += 1
+            return batch
+
+    def _queued_rows(self):
+        return sum(request.input_ids.shape[0] for request in self._queue)
+
+    def _predict_batch(self, batch):
+        if len(batch) == 1:
+            return self._cbert.predict(batch[0].input_ids, batch[0].input_mask)
+
+        max_len = max(request.input_ids.shape[1] for request in batch)
+        input_ids = torch.cat([self._pad(r.input_ids, max_len, self._pad_token_id) for r in batch], dim=0)
+        input_mask = torch.cat([self._pad(r.input_mask, max_len, 0) for r in batch], dim=0)
+        return np.asarray(self._cbert.predict(input_ids, input_mask))
+
+    @staticmethod
+    def _pad(tensor, length, value):
+        if tensor.shape[1] == length:
+            return tensor
+        return torch.nn.functional.pad(tensor, (0, length - tensor.shape[1]), value=value)
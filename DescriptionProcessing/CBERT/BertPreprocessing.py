@@ -1,12 +1,16 @@
-import torch
 import re
-from transformers import BertTokenizer
+from transformers import BertTokenizer, BertTokenizerFast
 
 
 class BertPreprocessor:
-    def __init__(self, max_len):
+    def __init__(self, max_len, use_fast=True):
+        """
+        :param max_len: Sentences are truncated, and by default padded, to this many tokens
+        :param use_fast: Use the Rust tokenizer, it gives the same ids and can return offsets
+        """
         self._max_len = max_len
-        self._tokenizer = BertTokenizer.from_pretrained(
+        tokenizer_class = BertTokenizerFast if use_fast else BertTokenizer
+        self._tokenizer = tokenizer_class.from_pretrained(
             'bert-base-uncased',
             do_lower_case=True)
 
@@ -20,38 +24,58 @@ class BertPreprocessor:
         return t
 
     def tokenize_one_sentence(self, sentence):
-        tokens = self._tokenizer.tokenize(sentence)
-        input_ids = self._tokenizer.encode(sentence, add_special_tokens=True)
+        if not self._tokenizer.is_fast:
+            tokens = self._tokenizer.tokenize(sentence)
+            input_ids = self._tokenizer.encode(sentence, add_special_tokens=True)
+            return tokens, input_ids
+        tokens, input_ids, _ = self.tokenize_batch([sentence])[0]
         return tokens, input_ids
 
-    def preprocess_data(self, sentences):
-        input_ids = []
-        attention_masks = []
-
-        for sentence in sentences:
-            # `encode_plus` will:
-            #   (1) Tokenize the sentence.
-            #   (2) Prepend the `[CLS]` token to the start.
-            #   (3) Append the `[SEP]` token to the end.
-            #   (4) Map tokens to their IDs.
-            #   (5) Pad or truncate the sentence to `max_length`
-            #   (6) Create attention masks for [PAD] tokens.
-            encoded_dict = self._tokenizer.encode_plus(
-                sentence,                   # Sentence to encode.
-                add_special_tokens=True,    # Add '[CLS]' and '[SEP]'
-                max_length=self._max_len,   # Pad & truncate all sentences.
-                padding='max_length',
-                return_attention_mask=True,  # Construct attn. masks.
-                return_tensors='pt',        # Return pytorch tensors.
-                truncation=True             # Let the tokenizer truncate sentences
-            )
-            input_ids.append(encoded_dict['input_ids'])
-            attention_masks.append(encoded_dict['attention_mask'])
+    def tokenize_batch(self, sentences):
+        """
+        Tokenize many sentences in one pass of the fast tokenizer.
+        :return: For each sentence its tokens, its ids with '[CLS]' and '[SEP]',
+                 and the (start, end) character offsets of each token
+        """
+        encoded = self._tokenizer(
+            list(sentences),
+            add_special_tokens=True,
+            return_offsets_mapping=True,
+            return_special_tokens_mask=True
+        )
+        results = []
+        for idx in range(len(encoded['input_ids'])):
+            # tokenize() leaves out the special tokens, the ids keep them
+            special = encoded['special_tokens_mask'][idx]
+            tokens = [t for t, s in zip(encoded.tokens(idx), special) if s == 0]
+            offsets = [tuple(o) for o, s in zip(encoded['offset_mapping'][idx], special) if s == 0]
+            results.append((tokens, encoded['input_ids'][idx], offsets))
+        return results
 
-        # Convert the lists into tensors.
-        input_ids = torch.cat(input_ids, dim=0)
-        attention_masks = torch.cat(attention_masks, dim=0)
-        return input_ids, attention_masks
+    def preprocess_data(self, sentences, pad_to_longest=False):
+        """
+        :param sentences: List of sentences to encode in one batch
+        :param pad_to_longest: Pad to the longest sentence in the batch rather than max_len.
+                               Sentences are still truncated to max_len.
+        :return: input ids and attention masks, one row per sentence
+        """
+        # The tokenizer will, for the whole batch:
+        #   (1) Tokenize the sentence.
+        #   (2) Prepend the `[CLS]` token to the start.
+        #   (3) Append the `[SEP]` token to the end.
+        #   (4) Map tokens to their IDs.
+        #   (5) Pad or truncate the sentence to `max_length`, or pad to the longest sentence
+        #   (6) Create attention masks for [PAD] tokens.
+        encoded_dict = self._tokenizer(
+            list(sentences),            # Sentences to encode.
+            add_special_tokens=True,    # Add '[CLS]' and '[SEP]'
+            max_length=self._max_len,   # Pad & truncate all sentences.
+            padding='longest' if pad_to_longest else 'max_length',
+            return_attention_mask=True,  # Construct attn. masks.
+            return_tensors='pt',        # Return pytorch tensors.
+            truncation=True             # Let the tokenizer truncate sentences
+        )
+        return encoded_dict['input_ids'], encoded_dict['attention_mask']
 
     def show_tokenizer_info(self):
         sentence = "Welcome to the bert tokenizer.  I hope you enjoy it."
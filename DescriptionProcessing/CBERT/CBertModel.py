@@ -1,4 +1,6 @@
 import os
+import inspect
+import json
 import time
 import datetime
 import pickle
@@ -7,23 +9,73 @@ import random
 from Common.Logger import Logger
 from Common.gpu import check_for_GPU
 import numpy as np
-import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
 
 import torch
 from torch.utils.data import TensorDataset, random_split
 from torch.utils.data import DataLoader, RandomSampler, SequentialSampler
-from transformers import BertForSequenceClassification, AdamW
-from transformers import get_linear_schedule_with_warmup
+from safetensors.torch import save_file
+from transformers import BertConfig, BertForSequenceClassification
+from DescriptionProcessing.CBERT.LengthBuckets import LengthBucketSampler, trim_padding
+
+
+# numpy type of each safetensors dtype
+_SAFETENSORS_DTYPES = {
+    "F64": np.float64, "F32": np.float32, "F16": np.float16,
+    "I64": np.int64, "I32": np.int32, "I16": np.int16, "I8": np.int8, "U8": np.uint8, "BOOL": np.bool_,
+}
+
+
+def _map_safetensors(file_name):
+    """
+    Memory map every tensor in a safetensors file.  Works with any torch version, unlike
+    safetensors.torch.load_file which needs torch >= 1.11 to map rather than read the file.
+    :return: Tensor name to a tensor backed by the mapped file
+    """
+    with open(file_name, 'rb') as in_file:
+        header_len = int.from_bytes(in_file.read(8), "little")
+        header = json.loads(in_file.read(header_len))
+    header.pop("__metadata__", None)
+
+    # Copy on write, pages stay shared with the page cache unless a tensor is written to
+    data = np.memmap(file_name, dtype=np.uint8, mode='c', offset=8 + header_len)
+    tensors = {}
+    for name, info in header.items():
+        if info["dtype"] not in _SAFETENSORS_DTYPES:
+            raise ValueError(f"Cannot map {name} in {file_name}, {info['dtype']} tensors are not supported")
+        start, end = info["data_offsets"]
+        array = data[start:end].view(_SAFETENSORS_DTYPES[info["dtype"]]).reshape(info["shape"])
+        tensors[name] = torch.from_numpy(array)
+    return tensors
+
+
+def _builds_on_meta():
+    # torch >= 2.0 can build modules on the meta device, without allocating their weights
+    return hasattr(torch.device, "__enter__")
+
+
+class _LogitsOnly(torch.nn.Module):
+    # Exporters need plain tensors in and out rather than keyword arguments and a ModelOutput
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, input_ids, attention_mask):
+        return self.model(input_ids, attention_mask=attention_mask).logits
 
 
 class CBert:
-    def __init__(self, logger: Logger, num_labels, models_dir, model_vers):
+    def __init__(self, logger: Logger, num_labels, models_dir, model_vers, backend="fp32", num_threads=0):
+        """
+        :param backend: 'fp32' runs the model as trained, 'int8' quantizes its Linear layers for CPU inference,
+                        'torchscript' runs a traced copy of the model cached next to model.pk
+        :param num_threads: Threads torch uses within an operation, 0 keeps torch's default of one per core
+        """
         # https://www.tensorflow.org/official_models/fine_tuning_bert
         self._lgr = logger
         self._lgr.info(f"Init CBERT with model vers: {model_vers}")
         self._device, self._strategy = check_for_GPU()
+        if num_threads > 0:
+            torch.set_num_threads(num_threads)
 
         # For fine-tuning BERT on a specific task, the authors recommend a batch
         # size of 16 or 32 and 4 epochs.
@@ -33,6 +85,9 @@ class CBert:
 
         self._models_dir = models_dir
         self._model_version = model_vers
+        self._backend = backend
+        # File the restored weights came from, None for the pretrained base model
+        self.weights_file = None
         if model_vers is None:
             self._model = self._load_base_model()
             self._model_version = 'pretrained'
@@ -44,23 +99,36 @@ class CBert:
 
         self._lgr.info("Done with CBERT init")
 
-    def split_datasets(self, input_ids, attention_masks, labels):
+    # Every split of the same data holds out the same sentences, so accuracy checks
+    # after training only see sentences the model wasn't trained on
+    SPLIT_SEED = 42
+
+    def split_datasets(self, input_ids, attention_masks, labels, bucket_by_length=False):
         labels = torch.tensor(labels)
         dataset = TensorDataset(input_ids, attention_masks, labels)
         train_size = int(0.9 * len(dataset))
         val_size = len(dataset) - train_size
-        train_dataset, val_dataset = random_split(dataset, [train_size, val_size])
+        generator = torch.Generator().manual_seed(self.SPLIT_SEED)
+        train_dataset, val_dataset = random_split(dataset, [train_size, val_size], generator=generator)
 
         self._lgr.info('{:>5,} training samples'.format(train_size))
         self._lgr.info('{:>5,} validation samples'.format(val_size))
 
         # Create the DataLoaders for our training and validation sets.
         # We'll take training samples in random order.
-        self._train_dataloader = DataLoader(
-            train_dataset,  # The training samples.
-            sampler=RandomSampler(train_dataset),  # Select batches randomly
-            batch_size=self.batch_size  # Trains with this batch size.
-        )
+        if bucket_by_length:
+            # Batches of similar length sentences waste less compute on [PAD] tokens
+            lengths = attention_masks[train_dataset.indices].sum(dim=1).tolist()
+            self._train_dataloader = DataLoader(
+                train_dataset,
+                batch_sampler=LengthBucketSampler(lengths, self.batch_size)
+            )
+        else:
+            self._train_dataloader = DataLoader(
+                train_dataset,  # The training samples.
+                sampler=RandomSampler(train_dataset),  # Select batches randomly
+                batch_size=self.batch_size  # Trains with this batch size.
+            )
 
         # For validation the order doesn't matter, so we'll just read them sequentially.
         self._validation_dataloader = DataLoader(
@@ -84,18 +152,179 @@ class CBert:
             pickle.dump(configuration, handle, protocol=pickle.HIGHEST_PROTOCOL)
 
         self._model_version = version
+        self.save_mapped()
+
+    def save_mapped(self):
+        """
+        Write the model as model.safetensors and config.json, which _restore_model
+        memory maps instead of unpickling model.pk.  Buffers the state dict leaves
+        out are saved too so the model can be rebuilt from this file alone.
+        """
+        model_dir = f"{self._models_dir}/bert_{self._model_version}"
+        tensors = {name: t.contiguous() for name, t in self._model.state_dict().items()}
+        tensors.update({name: b.contiguous() for name, b in self._model.named_buffers()})
+
+        # Write then rename so a worker starting now never maps a partial file
+        tmp_name = f"{model_dir}/model.safetensors.{os.getpid()}.tmp"
+        save_file(tensors, tmp_name)
+        os.replace(tmp_name, model_dir + "/model.safetensors")
+        self._model.config.to_json_file(model_dir + "/config.json")
+        self._lgr.info(f"Saved memory mappable model to {model_dir}")
+
+    def export_onnx(self, quantize=False):
+        """
+        Write the model as model.onnx next to model.pk, to be served by OnnxBert.
+        Batch size and sentence length stay dynamic.
+        :param quantize: Also write model.int8.onnx with int8 weights
+        :return: File name of the exported model
+        """
+        assert self._model is not None, "Model not set, call 'load_module'"
+        model_dir = f"{self._models_dir}/bert_{self._model_version}"
+        file_name = model_dir + "/model.onnx"
+
+        input_ids = torch.ones((1, 8), dtype=torch.long)
+        attention_mask = torch.ones((1, 8), dtype=torch.long)
+        # The exporter puts the module back in its original mode afterwards, so that must be eval
+        model = _LogitsOnly(self._model).eval()
+        export_args = {}
+        if "dynamo" in inspect.signature(torch.onnx.export).parameters:
+            # Newer torch defaults to the dynamo exporter, keep the TorchScript one onnxruntime quantizes
+            export_args["dynamo"] = False
+        torch.onnx.export(model, (input_ids, attention_mask), file_name,
+                          input_names=["input_ids", "attention_mask"],
+                          output_names=["logits"],
+                          dynamic_axes={
+                              "input_ids": {0: "batch", 1: "sequence"},
+                              "attention_mask": {0: "batch", 1: "sequence"},
+                              "logits": {0: "batch"}
+                          },
+                          opset_version=13,
+                          **export_args)
+        self._lgr.info(f"Exported ONNX model to {file_name}")
+
+        if quantize:
+            from onnxruntime.quantization import quantize_dynamic, QuantType
+            quantize_dynamic(file_name, model_dir + "/model.int8.onnx", weight_type=QuantType.QInt8)
+        return file_name
 
     def _restore_model(self, version):
         self._lgr.info(f"Restoring model to version {version}")
         model_dir = f"{self._models_dir}/bert_{version}"
-        with open(model_dir + "/config.pkl", 'rb') as handle:
-            # configuration = BertConfig()
-            configuration = pickle.load(handle)
-        model = BertForSequenceClassification(configuration)
-        model.load_state_dict(torch.load(model_dir + "/model.pk"))
+        if os.path.exists(model_dir + "/model.safetensors"):
+            weights_file = model_dir + "/model.safetensors"
+            model = self._load_mapped(model_dir)
+        else:
+            weights_file = model_dir + "/model.pk"
+            with open(model_dir + "/config.pkl", 'rb') as handle:
+                # configuration = BertConfig()
+                configuration = pickle.load(handle)
+            model = BertForSequenceClassification(configuration)
+            model.load_state_dict(torch.load(weights_file))
+        self.weights_file = weights_file
         model.eval()
+        # Nothing writes to the weights when serving, so forked workers keep sharing them
+        model.requires_grad_(False)
+        if self._backend == "int8":
+            model = self._quantize(model)
+        elif self._backend == "torchscript":
+            model = self._load_traced(model, model_dir, weights_file)
+        return model
+
+    @staticmethod
+    def _load_mapped(model_dir):
+        # The tensors are backed by the mapped file, pages are read on first use and
+        # shared through the page cache by every process that maps the same file
+        configuration = BertConfig.from_json_file(model_dir + "/config.json")
+        tensors = _map_safetensors(model_dir + "/model.safetensors")
+        if _builds_on_meta():
+            # Build the modules without allocating or initialising any weights
+            with torch.device("meta"):
+                model = BertForSequenceClassification(configuration)
+        else:
+            # Older torch initialises the weights first, they are freed as the mapped tensors replace them
+            model = BertForSequenceClassification(configuration)
+
+        expected = {name for name, _ in list(model.named_parameters()) + list(model.named_buffers())}
+        missing = sorted(expected - tensors.keys())
+        unexpected = sorted(tensors.keys() - expected)
+        if len(missing) > 0 or len(unexpected) > 0:
+            raise ValueError(f"{model_dir}/model.safetensors doesn't match the model, missing {missing}, "
+                             f"unexpected {unexpected}, convert the model again")
+
+        for name, tensor in tensors.items():
+            module_name, _, attr = name.rpartition(".")
+            module = model.get_submodule(module_name)
+            if attr in module._parameters:
+                module._parameters[attr] = torch.nn.Parameter(tensor, requires_grad=False)
+            else:
+                module._buffers[attr] = tensor
         return model
 
+    def _load_traced(self, model, model_dir, weights_file):
+        """
+        :return: The model traced to TorchScript, cached as model.ts until the weights change
+        """
+        file_name = model_dir + "/model.ts"
+        if os.path.exists(file_name) and os.path.getmtime(file_name) >= os.path.getmtime(weights_file):
+            try:
+                return torch.jit.load(file_name)
+            except Exception as e:
+                self._lgr.warn(f"Cannot load {file_name}, tracing the model again: {e}")
+
+        # Trace a padded batch so the attention mask is used, batch size and length stay dynamic
+        input_ids = torch.ones((2, 16), dtype=torch.long)
+        attention_mask = torch.ones((2, 16), dtype=torch.long)
+        attention_mask[1, 8:] = 0
+        with torch.no_grad():
+            traced = torch.jit.trace(_LogitsOnly(model).eval(), (input_ids, attention_mask))
+        traced = torch.jit.freeze(traced)
+
+        # Write then rename so other workers never load a partial file
+        tmp_name = f"{file_name}.{os.getpid()}.tmp"
+        torch.jit.save(traced, tmp_name)
+        os.replace(tmp_name, file_name)
+        self._lgr.info(f"Traced model saved to {file_name}")
+        return traced
+
+    @staticmethod
+    def _quantize(model):
+        # Weights of every Linear layer go to int8, activations are quantized on the fly
+        return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+    def quantized_accuracy(self):
+        """
+        Compare an int8 copy of the model against the fp32 model on the validation split.
+        :return: fp32 accuracy, int8 accuracy and the fraction of sentences both give the same label
+        """
+        assert self._backend == "fp32", "Compare against the fp32 model"
+        assert self._validation_dataloader is not None, "Validation dataloader not set, call 'split_datasets'"
+        quantized = self._quantize(self._model)
+
+        fp32_correct = 0
+        int8_correct = 0
+        agree = 0
+        total = 0
+        for batch in self._validation_dataloader:
+            b_input_ids, b_input_mask = trim_padding(batch[0], batch[1])
+            with torch.no_grad():
+                fp32_logits = self._model(b_input_ids, attention_mask=b_input_mask).logits
+                int8_logits = quantized(b_input_ids, attention_mask=b_input_mask).logits
+            fp32_pred = np.argmax(fp32_logits.numpy(), axis=1)
+            int8_pred = np.argmax(int8_logits.numpy(), axis=1)
+            labels = batch[2].numpy()
+            fp32_correct += np.sum(fp32_pred == labels)
+            int8_correct += np.sum(int8_pred == labels)
+            agree += np.sum(fp32_pred == int8_pred)
+            total += len(labels)
+
+        results = {
+            'fp32 Accur.': fp32_correct / total,
+            'int8 Accur.': int8_correct / total,
+            'Agreement': agree / total
+        }
+        print("  fp32 accuracy: {0:.3f}, int8 accuracy: {1:.3f}, agreement: {2:.3f}".format(*results.values()))
+        return results
+
     def _load_base_model(self):
         self._lgr.info(f"Restoring model to base pretrained")
         verbose = False
@@ -129,11 +358,15 @@ class CBert:
         return model
 
     def predict(self, input_ids, input_mask):
+        input_ids, input_mask = trim_padding(input_ids, input_mask)
         with torch.no_grad():
             # Forward pass, calculate logit predictions.
-            results = self._model(input_ids, attention_mask=input_mask)
+            if self._backend == "torchscript":
+                # The traced model takes the mask positionally and returns just the logits
+                logits = self._model(input_ids, input_mask)
+            else:
+                logits = self._model(input_ids, attention_mask=input_mask).logits
 
-        logits = results.logits
         logits = logits.detach().cpu().numpy()
         return logits
 
@@ -142,6 +375,10 @@ class CBert:
         assert self._train_dataloader is not None, "Train dataloader not set, call 'split_datasets'"
         assert self._validation_dataloader is not None, "Validation dataloader not set, call 'split_datasets'"
 
+        # Training-only, not imported when the model is only served
+        from transformers import AdamW, get_linear_schedule_with_warmup
+
+        self._model.requires_grad_(True)
         optimizer = AdamW(self._model.parameters(),
                           lr=2e-5,  # args.learning_rate
                           eps=1e-8  # args.adam_epsilon
@@ -226,8 +463,9 @@ class CBert:
             #   [0]: input ids
             #   [1]: attention masks
             #   [2]: labels
-            b_input_ids = batch[0].to(self._device)
-            b_input_mask = batch[1].to(self._device)
+            b_input_ids, b_input_mask = trim_padding(batch[0], batch[1])
+            b_input_ids = b_input_ids.to(self._device)
+            b_input_mask = b_input_mask.to(self._device)
             b_labels = batch[2].to(self._device)
 
             # Always clear any previously calculated gradients before performing a
@@ -321,8 +559,9 @@ class CBert:
         #   [0]: input ids
         #   [1]: attention masks
         #   [2]: labels
-        b_input_ids = batch[0].to(self._device)
-        b_input_mask = batch[1].to(self._device)
+        b_input_ids, b_input_mask = trim_padding(batch[0], batch[1])
+        b_input_ids = b_input_ids.to(self._device)
+        b_input_mask = b_input_mask.to(self._device)
         b_labels = batch[2].to(self._device)
         # Tell pytorch not to bother with constructing the compute graph during
         # the forward pass, since this is only needed for backprop (training).
@@ -371,6 +610,11 @@ class CBert:
 
     @staticmethod
     def show_training_stats(training_stats):
+        # Plotting libraries are slow to import and only used here
+        import pandas as pd
+        import matplotlib.pyplot as plt
+        import seaborn as sns
+
         pd.set_option('precision', 2)
         df_stats = pd.DataFrame(data=training_stats)
         df_stats = df_stats.set_index('epoch')
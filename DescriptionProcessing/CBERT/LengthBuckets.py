@@ -0,0 +1,39 @@
+import math
+import torch
+from torch.utils.data import Sampler
+
+
+def trim_padding(input_ids, attention_mask):
+    """
+    Drop the [PAD] columns that every row of a right padded batch shares, so
+    attention only runs over the longest sentence actually in the batch.
+    """
+    length = int(attention_mask.sum(dim=1).max())
+    return input_ids[:, :length], attention_mask[:, :length]
+
+
+class LengthBucketSampler(Sampler):
+    """
+    Batches of dataset indices with similar sentence lengths, so trim_padding
+    can cut each batch short.  Every epoch the indices are shuffled into pools
+    of pool_batches batches and only sorted by length within a pool, so the
+    sentences batched together change from epoch to epoch.  The batches come
+    out in a random order.
+    """
+    def __init__(self, lengths, batch_size, pool_batches=50):
+        self._lengths = list(lengths)
+        self._batch_size = batch_size
+        self._pool_size = batch_size * pool_batches
+
+    def __iter__(self):
+        shuffled = torch.randperm(len(self._lengths)).tolist()
+        batches = []
+        for start in range(0, len(shuffled), self._pool_size):
+            pool = sorted(shuffled[start:start + self._pool_size], key=lambda idx: self._lengths[idx])
+            batches += [pool[b:b + self._batch_size] for b in range(0, len(pool), self._batch_size)]
+        for idx in torch.randperm(len(batches)).tolist():
+            yield batches[idx]
+
+    def __len__(self):
+        full_pools, rest = divmod(len(self._lengths), self._pool_size)
+        return full_pools * (self._pool_size // self._batch_size) + math.ceil(rest / self._batch_size)
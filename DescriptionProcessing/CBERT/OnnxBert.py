@@ -0,0 +1,48 @@
+import numpy as np
+import onnxruntime as ort
+
+from Common.Logger import Logger
+
+
+class OnnxBert:
+    """
+    Serves a model exported with CBert.export_onnx through ONNX Runtime on
+    the CPU.  predict has the same contract as CBert.predict, so it can be
+    used wherever a CBert is.
+    """
+    def __init__(self, logger: Logger, models_dir, model_vers, quantized=False, optimize=True, num_threads=0):
+        """
+        :param quantized: Load model.int8.onnx, written by CBert.export_onnx(quantize=True)
+        :param optimize: Let ONNX Runtime fuse and fold the graph when the session is created
+        :param num_threads: Threads used within an operation, 0 keeps ONNX Runtime's default of one per core
+        """
+        self._lgr = logger
+        model_dir = f"{models_dir}/bert_{model_vers}"
+        file_name = f"{model_dir}/model.int8.onnx" if quantized else f"{model_dir}/model.onnx"
+        self._lgr.info(f"Init ONNX BERT from {file_name}")
+        self.weights_file = file_name
+
+        options = ort.SessionOptions()
+        if optimize:
+            options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        else:
+            options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_DISABLE_ALL
+        options.intra_op_num_threads = num_threads
+        self._session = ort.InferenceSession(file_name, options, providers=["CPUExecutionProvider"])
+
+    def predict(self, input_ids, input_mask):
+        """
+        :param input_ids: Token ids, torch tensor or numpy array, one row per sentence
+        :param input_mask: Attention mask of the same shape
+        :return: numpy array of logits, one row per sentence
+        """
+        input_ids = np.asarray(input_ids, dtype=np.int64)
+        input_mask = np.asarray(input_mask, dtype=np.int64)
+
+        # Drop the [PAD] columns every row shares
+        length = int(input_mask.sum(axis=1).max())
+        logits, = self._session.run(["logits"], {
+            "input_ids": input_ids[:, :length],
+            "attention_mask": input_mask[:, :length]
+        })
+        return logits
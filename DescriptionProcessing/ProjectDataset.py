@@ -99,9 +99,9 @@ class ProjectDataset:
         subsectors = {}
         labels = {}
 
-        for p in self.__projects:
-            # Tokenize the text with all special tokens.
-            tokens, input_ids = bpp.tokenize_one_sentence(p.description)
+        # Tokenize the text with all special tokens, all projects in one batch.
+        tokenized = bpp.tokenize_batch([p.description for p in self.__projects])
+        for p, (tokens, input_ids, _) in zip(self.__projects, tokenized):
             char_count = len(input_ids)
             for hundred in [1, 2, 3, 4, 5]:
                 if char_count > hundred * 100:
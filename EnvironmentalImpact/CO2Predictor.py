@@ -1,3 +1,5 @@
+from collections import defaultdict
+import numpy as np
 from Common.Logger import Logger
 from Projects.GenericProject import IProject
 from Projects.Energy import Energy
@@ -9,7 +11,8 @@ from Projects.Rules import TONS_CONCRETE, GALLONS_DIESEL, SURFACE_AREA, TONS_STE
 from Projects.Road import Road
 # from Projects.Rules import TONS_CONCRETE, GALLONS_DIESEL, SURFACE_AREA, TONS_ASPHALT
 from Projects.Rules import SURFACE_TYPE
-from RulesEngine.RulesEngine import RulesEngine, Fact, Rule
+from Common.Cache import canonical_key
+from RulesEngine.RulesEngine import Rule, RuleGraph
 from EnvironmentalImpact.ImpactConversions import tons_co2_per_ton_concrete, tons_co2_per_gallon_diesel
 from EnvironmentalImpact.UnitConversions import sq_meter_per_sq_foot, ton_per_KG
 from EnvironmentalImpact.LCAConnector import LCAConnector
@@ -31,94 +34,118 @@ class CO2Predictor:
         f"co2 = co2_concrete + co2_diesel",
     ]
 
+    # Material quantities the rules read from a project, missing or None counts as 0
+    INPUTS = [TONS_CONCRETE, GALLONS_DIESEL]
+
+    # Compiled once and shared, each calculation only binds its project's materials
+    TEMPLATE = RuleGraph([Rule(r) for r in RULES], list(FACTS.keys()) + INPUTS)
+
+    def version(self):
+        """
+        :return: Changes whenever the emission factors, rules or LCA results change
+        """
+        return canonical_key(self.FACTS, self.RULES, self.lca.version())
+
     def co2_emissions_method_a(self, project: IProject):
+        self.lgr.info("Calculating using method a")
+        co2 = self._evaluate_co2(self._material_facts(project))
+        return True, co2
+
+    def co2_emissions_method_a_batch(self, projects):
+        """
+        Method a for many projects of the same type in one vectorized pass.
+        :return: True and the list of CO2 values, in the order of projects
+        """
+        self.lgr.info(f"Calculating {len(projects)} projects using method a")
+        columns = defaultdict(list)
+        for project in projects:
+            for name, value in self._material_facts(project).items():
+                columns[name].append(0.0 if value is None else value)
+
+        materials = {name: np.asarray(col) for name, col in columns.items()}
+        co2 = self._evaluate_co2(materials)
+        return True, np.broadcast_to(co2, (len(projects),)).tolist()
+
+    def _evaluate_co2(self, materials):
+        values = dict(self.FACTS)
+        for name in self.INPUTS:
+            values[name] = 0.0
+        for name, value in materials.items():
+            values[name] = 0.0 if value is None else value
+        return self.TEMPLATE.evaluate(values)["co2"][0]
+
+    def _material_facts(self, project: IProject):
+        # Quantities each type of project contributes to method a
         if isinstance(project, Energy):
-            self.lgr.info("Calculating using method a")
-            rules_engine = self._get_clear_rules_engine()
-            rules_engine.add_fact(Fact("has_value", POWER_OUTPUT, project.get_param_value(POWER_OUTPUT)))
-            rules_engine.add_fact(Fact("has_value", TONS_CONCRETE, project.get_param_value(TONS_CONCRETE)))
-            rules_engine.add_fact(Fact("has_value", TONS_STEEL, project.get_param_value(TONS_STEEL)))
-            rules_engine.add_fact(Fact("has_value", ENERGY_TYPE, project.get_param_value(ENERGY_TYPE)))
-            rules_engine.add_fact(Fact("has_value", GALLONS_DIESEL, 0))
-            co2 = rules_engine.query("has_value", "co2")
-            return True, co2[0]
+            facts = self._param_values(project, [POWER_OUTPUT, TONS_CONCRETE, TONS_STEEL, ENERGY_TYPE])
+            facts[GALLONS_DIESEL] = 0
         elif isinstance(project, Railway):
-            self.lgr.info("Calculating using method a")
-            rules_engine = self._get_clear_rules_engine()
-            rules_engine.add_fact(Fact("has_value", TONS_CONCRETE, project.get_param_value(TONS_CONCRETE)))
-            rules_engine.add_fact(Fact("has_value", TONS_STEEL, project.get_param_value(TONS_STEEL)))
-            rules_engine.add_fact(Fact("has_value", TONS_BALLAST, project.get_param_value(TONS_BALLAST)))
-            rules_engine.add_fact(Fact("has_value", TONS_TIMBER, project.get_param_value(TONS_TIMBER)))
-            rules_engine.add_fact(Fact("has_value", GALLONS_DIESEL, 0))
-            co2 = rules_engine.query("has_value", "co2")
-            return True, co2[0]
+            facts = self._param_values(project, [TONS_CONCRETE, TONS_STEEL, TONS_BALLAST, TONS_TIMBER])
+            facts[GALLONS_DIESEL] = 0
         elif isinstance(project, Road):
-            self.lgr.info("Calculating using method a")
-            rules_engine = self._get_clear_rules_engine()
-            rules_engine.add_fact(Fact("has_value", TONS_CONCRETE, project.get_param_value(TONS_CONCRETE)))
-            rules_engine.add_fact(Fact("has_value", TONS_ASPHALT, project.get_param_value(TONS_ASPHALT)))
-            rules_engine.add_fact(Fact("has_value", SURFACE_TYPE, project.get_param_value(SURFACE_TYPE)))
-            rules_engine.add_fact(Fact("has_value", GALLONS_DIESEL, 0))
-            co2 = rules_engine.query("has_value", "co2")
-            return True, co2[0]
-        #elif isinstance(project, Bridge):
+            facts = self._param_values(project, [TONS_CONCRETE, TONS_ASPHALT, SURFACE_TYPE])
+            facts[GALLONS_DIESEL] = 0
         else:
-            self.lgr.info("Calculating using method a")
-            rules_engine = self._get_clear_rules_engine()
-            rules_engine.add_fact(Fact("has_value", TONS_CONCRETE, project.get_param_value(TONS_CONCRETE)))
-            rules_engine.add_fact(Fact("has_value", GALLONS_DIESEL, project.get_param_value(GALLONS_DIESEL)))
-            co2 = rules_engine.query("has_value", "co2")
-            return True, co2[0]
-
+            facts = self._param_values(project, [TONS_CONCRETE, GALLONS_DIESEL])
+        return facts
 
+    @staticmethod
+    def _param_values(project: IProject, param_names):
+        return {name: project.get_param_value(name) for name in param_names}
 
-    def co2_emissions_method_b(self, project: IProject):
+    def co2_emissions_method_b(self, project: IProject, deadline=None):
         self.lgr.info("Calculating using method b")
 
-        if isinstance(project, Energy):
-            area = project.get_param_value(AREA)
-            ok, results = self.lca.get_co2(area, project)
-            if ok:
-                co2 = results * ton_per_KG
-                return True, co2
-            else:
-                return False, results
+        if not self._is_lca_project(project):
+            return self.co2_emissions_method_a(project)
 
-        elif isinstance(project, Road):
-            area = project.get_param_value(SURFACE_AREA)
-            ok, results = self.lca.get_co2(area, project)
-            if ok:
-                co2 = results * ton_per_KG
-                return True, co2
-            else:
-                return False, results
+        ok, results = self.lca.get_co2(self._functional_amount(project), project, deadline)
+        if ok:
+            co2 = results * ton_per_KG
+            return True, co2
+        else:
+            return False, results
 
-        elif isinstance(project, Bridge):
-            area = project.get_param_value(SURFACE_AREA) * sq_meter_per_sq_foot
-            ok, results = self.lca.get_co2(area, project)
-            if ok:
-                co2 = results * ton_per_KG
-                return True, co2
-            else:
-                return False, results
+    def batches_method_b(self, projects):
+        """
+        :param projects: Projects that are all of the same type
+        :return: True if method b for all of them takes a single LCA lookup
+        """
+        return self.lca.is_linear() and self._is_lca_project(projects[0])
 
-        elif isinstance(project, Railway):
-            length = project.get_param_value(LENGTH) * sq_meter_per_sq_foot
-            ok, results = self.lca.get_co2(length, project)
-            if ok:
-                co2 = results * ton_per_KG
-                return True, co2
-            else:
-                return False, results
+    def co2_emissions_method_b_batch(self, projects, deadline=None):
+        """
+        Method b for many projects of the same type with one vectorized LCA lookup.
+        Only for LCA backends whose results scale linearly, see batches_method_b.
+        :param deadline: time.monotonic() after which to give up waiting for the LCA system
+        :return: (True, (ok, CO2) for each project in order) or (False, error message)
+        """
+        self.lgr.info(f"Calculating {len(projects)} projects using method b")
+        amounts = [self._functional_amount(project) for project in projects]
+        known = [idx for idx, amount in enumerate(amounts) if amount is not None]
+        ok, results = self.lca.get_co2_batch([amounts[idx] for idx in known], type(projects[0]), deadline)
+        if not ok:
+            return False, results
 
-        else:
-            return self.co2_emissions_method_a(project)
+        co2 = [(False, "Project size unknown")] * len(projects)
+        for pos, idx in enumerate(known):
+            co2[idx] = True, float(results[pos]) * ton_per_KG
+        return True, co2
+
+    @staticmethod
+    def _is_lca_project(project: IProject):
+        return isinstance(project, (Energy, Road, Bridge, Railway))
 
-    def _get_clear_rules_engine(self):
-        rules_engine = RulesEngine()
-        for f in self.FACTS.keys():
-            rules_engine.add_fact(Fact("has_value", f, self.FACTS[f]))
-        for r in self.RULES:
-            rules_engine.add_rule(Rule(r))
-        rules_engine.set_default_behavior(0.0)
-        return rules_engine
+    @staticmethod
+    def _functional_amount(project: IProject):
+        # Amount of each type of project's product system, in its functional unit
+        if isinstance(project, Energy):
+            return project.get_param_value(AREA)
+        elif isinstance(project, Road):
+            return project.get_param_value(SURFACE_AREA)
+        elif isinstance(project, Bridge):
+            area = project.get_param_value(SURFACE_AREA)
+            return None if area is None else area * sq_meter_per_sq_foot
+        else:
+            length = project.get_param_value(LENGTH)
+            return None if length is None else length * sq_meter_per_sq_foot
@@ -0,0 +1,74 @@
+import queue
+import threading
+import time
+from contextlib import contextmanager
+import olca
+
+
+class LCAUnavailableError(Exception):
+    pass
+
+
+class LCAClientPool:
+    """
+    Long lived openLCA IPC clients shared by every request in a worker.
+    At most pool_size calculations run against the server at once, a client
+    that fails is dropped and replaced by a new one on the next request.
+    """
+    def __init__(self, logger, port, pool_size, wait_timeout, check_interval, client_factory=None):
+        """
+        :param wait_timeout: Seconds to wait for a free client before giving up
+        :param check_interval: Seconds a client may sit idle before it is health checked
+        :param client_factory: Creates a new client, defaults to olca.Client on port
+        """
+        self._lgr = logger
+        self._wait_timeout = wait_timeout
+        self._check_interval = check_interval
+        self._client_factory = client_factory
+        if self._client_factory is None:
+            self._client_factory = lambda: olca.Client(port)
+        self._slots = threading.BoundedSemaphore(pool_size)
+        self._idle = queue.LifoQueue()
+
+    @contextmanager
+    def client(self, deadline=None):
+        """
+        :param deadline: time.monotonic() after which to stop waiting for a free client
+        """
+        wait = self._wait_timeout
+        if deadline is not None:
+            wait = max(0.0, min(wait, deadline - time.monotonic()))
+        if not self._slots.acquire(timeout=wait):
+            raise LCAUnavailableError(f"No openLCA client free after {wait:.2f} seconds")
+        client = None
+        try:
+            client = self._checkout()
+            yield client
+            self._idle.put((client, time.monotonic()))
+        except Exception:
+            if client is not None:
+                self._lgr.warn("Dropping openLCA client after failure")
+            raise
+        finally:
+            self._slots.release()
+
+    def idle_count(self):
+        return self._idle.qsize()
+
+    def _checkout(self):
+        while True:
+            try:
+                client, last_used = self._idle.get_nowait()
+            except queue.Empty:
+                self._lgr.info("Open connection to LCA")
+                return self._client_factory()
+            if time.monotonic() - last_used < self._check_interval or self._is_healthy(client):
+                return client
+
+    def _is_healthy(self, client):
+        try:
+            next(iter(client.get_descriptors(olca.ImpactMethod)), None)
+            return True
+        except Exception:
+            self._lgr.warn("Idle openLCA client failed health check")
+            return False
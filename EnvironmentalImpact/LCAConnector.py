@@ -1,4 +1,12 @@
+from contextlib import contextmanager
+import numpy as np
 import olca
+from Common.Config import get_config
+from Common.Cache import canonical_key
+from Common.CircuitBreaker import CircuitBreaker, CircuitOpenError
+from EnvironmentalImpact.LCAClientPool import LCAClientPool, LCAUnavailableError
+from EnvironmentalImpact.LCAReferenceCache import LCAReferenceCache
+from EnvironmentalImpact.LCAFactorCache import LCAFactorCache
 from Projects.GenericProject import IProject
 from Projects.Energy import Energy
 from Projects.Rules import ENERGY_TYPE, AREA, POWER_OUTPUT, TONS_STEEL
@@ -6,6 +14,16 @@ from Projects.Bridge import Bridge
 from Projects.Road import Road
 from Projects.Railway import Railway
 
+IMPACT_METHOD = 'EF 3.0 Method'
+
+# Product system in the openLCA database for each type of project
+PRODUCT_SYSTEMS = {
+    Bridge: 'SimpleBridge',
+    Energy: 'Energy',
+    Road: 'Road',
+    Railway: 'Railway',
+}
+
 # Start openLCA
 # Open the Construction DB
 #    Verify 'SimpleBridge' in Product systems
@@ -14,52 +32,167 @@ from Projects.Railway import Railway
 #    Choose port 8080
 #
 class LCAConnector:
-    def __init__(self, logger):
+    def __init__(self, logger, pool: LCAClientPool = None, references: LCAReferenceCache = None,
+                 factors: LCAFactorCache = None, breaker: CircuitBreaker = None):
         self._lgr = logger
-        self.port = 8080
+        cfg = get_config()
+        self.port = cfg.LCA_PORT
+        if pool is None:
+            pool = LCAClientPool(logger, self.port, cfg.LCA_POOL_SIZE,
+                                 cfg.LCA_POOL_TIMEOUT, cfg.LCA_HEALTH_CHECK_SECS)
+        if references is None:
+            references = LCAReferenceCache(logger, IMPACT_METHOD, PRODUCT_SYSTEMS, cfg.LCA_REFERENCE_TTL_SECS)
+        if factors is None:
+            factors = LCAFactorCache(logger, cfg.LCA_FACTOR_FILE, IMPACT_METHOD)
+        if breaker is None:
+            breaker = CircuitBreaker(cfg.LCA_BREAKER_FAILURES, cfg.LCA_BREAKER_RESET_SECS)
+        self._pool = pool
+        self._references = references
+        self._factors = factors
+        self._breaker = breaker
+        self._linear = cfg.LCA_MODE == "linear"
 
-    def _set_up_client(self):
+    def prewarm(self):
+        """
+        Look up the references for every project type so requests don't have to.
+        """
+        try:
+            with self._breaker_guard():
+                with self._pool.client() as client:
+                    for project_class in self._references.project_classes():
+                        self._references.get(client, project_class)
+            return True
+        except Exception:
+            self._lgr.warn("Cannot prewarm LCA references, will look them up on first use")
+            return False
+
+    def get_status(self):
+        return {
+            "circuit_breaker": self._breaker.status()
+        }
+
+    def is_linear(self):
+        """
+        :return: True if results scale linearly with the amount, so get_co2_batch answers many projects at once
+        """
+        return self._linear
+
+    def version(self):
+        """
+        :return: Changes whenever the LCA results can change
+        """
+        factors = self._factors.factors() if self._linear else None
+        return canonical_key("openlca", IMPACT_METHOD, sorted(PRODUCT_SYSTEMS.values()), factors)
+
+    def invalidate_references(self, project_class=None):
+        self._references.invalidate(project_class)
+
+    def refresh_factors(self):
+        """
+        Recalculate the per unit CO2 factor of every product system.  The stored
+        factors are only replaced once every system has been recalculated.
+        """
+        factors = {}
+        err = []
+        for project_class, system_name in PRODUCT_SYSTEMS.items():
+            try:
+                factors[system_name] = self._calculate(1.0, project_class)
+            except Exception as e:
+                err.append(f"Cannot calculate LCA factor for {project_class.__name__}: {e}")
+        if len(err) > 0:
+            return False, err
+        self._factors.replace(factors)
+        return True, err
+
+    def get_co2_factor(self, project_class, deadline=None):
+        """
+        :param deadline: time.monotonic() after which to give up if the factor has to be calculated
+        :return: CO2 emissions in KG per functional unit of the project's product system
+        """
+        system_name = PRODUCT_SYSTEMS.get(project_class)
+        if system_name is None:
+            raise ValueError(f"No LCA product system for {project_class.__name__}")
+        factor = self._factors.get(system_name)
+        if factor is None:
+            factor = self._calculate(1.0, project_class, deadline)
+            self._factors.set(system_name, factor)
+        return factor
+
+    def get_co2_batch(self, amounts, project_class, deadline=None):
+        """
+        :param amounts: Functional unit amounts, one per project
+        :param deadline: time.monotonic() after which to give up waiting for the LCA system
+        :return: (True, numpy array of CO2 emissions in KG) or (False, error message)
+        """
+        try:
+            return True, self.get_co2_factor(project_class, deadline) * np.asarray(amounts, dtype=float)
+        except CircuitOpenError:
+            return False, "LCA system unavailable"
+        except Exception:
+            return False, "Cannot connect to LCA system"
+
+    @staticmethod
+    def _set_up_calculation():
         # https://github.com/GreenDelta/olca-ipc.py
-        client = olca.Client(self.port)
         setup = olca.CalculationSetup()
 
         # define the calculation type here
         # see http://greendelta.github.io/olca-schema/html/CalculationType.html
         setup.calculation_type = olca.CalculationType.CONTRIBUTION_ANALYSIS
-        return client, setup
+        return setup
 
     def _close(self, client, result):
-        self._lgr.info("Close connection to LCA")
+        self._lgr.info("Dispose LCA result")
         # the result remains accessible (for exports etc.) until
         # you dispose it, which you should always do when you do
         # not need it anymore
         client.dispose(result)
 
-    def get_co2(self, surface_area, project: IProject):
+    def get_co2(self, surface_area, project: IProject, deadline=None):
         try:
-            co2 = self._get_co2(surface_area, project)
+            co2 = self._get_co2(surface_area, project, deadline)
             return True, co2
+        except CircuitOpenError:
+            return False, "LCA system unavailable"
         except Exception:
             return False, "Cannot connect to LCA system"
 
-    def _get_co2(self, surface_area, project: IProject):
+    def _get_co2(self, surface_area, project: IProject, deadline=None):
         """
         :param surface_area: Size of bridge in square feet
+        :param deadline: time.monotonic() after which to give up waiting for the LCA system
         :return: CO2 emissions in KG
         """
-        client, setup = self._set_up_client()
+        if self._linear:
+            return self.get_co2_factor(type(project), deadline) * surface_area
+        return self._calculate(surface_area, type(project), deadline)
 
-        # select the product system and LCIA method
+    def _calculate(self, amount, project_class, deadline=None):
+        with self._breaker_guard():
+            with self._pool.client(deadline) as client:
+                return self._calculate_co2(client, amount, project_class)
+
+    @contextmanager
+    def _breaker_guard(self):
+        # Fail fast while the LCA system is known to be down
+        if not self._breaker.allow():
+            raise CircuitOpenError("LCA circuit breaker is open")
+        try:
+            yield
+        except LCAUnavailableError:
+            # Every client was busy or the deadline had passed, openLCA itself wasn't called
+            self._breaker.record_skipped()
+            raise
+        except Exception:
+            self._breaker.record_failure()
+            raise
+        self._breaker.record_success()
 
-        setup.impact_method = client.find(olca.ImpactMethod, 'EF 3.0 Method')
-        if isinstance(project, Bridge):
-            setup.product_system = client.find(olca.ProductSystem, 'SimpleBridge')
-        elif isinstance(project, Energy):
-            setup.product_system = client.find(olca.ProductSystem, 'Energy')
-        elif isinstance(project, Road):
-            setup.product_system = client.find(olca.ProductSystem, 'Road')
-        elif isinstance(project, Railway):
-            setup.product_system = client.find(olca.ProductSystem, 'Railway')
+    def _calculate_co2(self, client, surface_area, project_class):
+        setup = self._set_up_calculation()
+
+        # select the product system and LCIA method
+        setup.impact_method, setup.product_system = self._references.get(client, project_class)
 
         # amount is the amount of the functional unit (fu) of the system that
         # should be used in the calculation; unit, flow property, etc. of the fu
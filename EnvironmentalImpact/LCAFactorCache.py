@@ -0,0 +1,93 @@
+import fcntl
+import json
+import os
+import threading
+from contextlib import contextmanager
+
+
+class LCAFactorCache:
+    """
+    kg CO2 eq per functional unit of each openLCA product system.  For a fixed
+    product system and impact method the result scales linearly with the
+    amount, so a single calculation per system answers every later request.
+    Factors are kept in a JSON file so they survive restarts and are shared
+    by all workers, each save merges in what other workers saved first.
+    """
+    def __init__(self, logger, file_name, impact_method):
+        self._lgr = logger
+        self._file_name = file_name
+        self._impact_method = impact_method
+        self._factors = {}
+        self._lock = threading.Lock()
+        self._load()
+
+    def get(self, system_name):
+        with self._lock:
+            return self._factors.get(system_name)
+
+    def set(self, system_name, factor):
+        with self._lock, self._file_lock():
+            # Keep factors other workers calculated since this one loaded the file
+            saved = self._read()
+            if saved is not None:
+                self._factors.update(saved)
+            self._factors[system_name] = factor
+            self._save()
+
+    def replace(self, factors):
+        """
+        :param factors: Product system name to factor, every factor kept before is dropped
+        """
+        with self._lock, self._file_lock():
+            self._factors = dict(factors)
+            self._save()
+
+    def factors(self):
+        with self._lock:
+            return dict(self._factors)
+
+    def _load(self):
+        factors = self._read()
+        if factors is not None:
+            self._factors = factors
+            self._lgr.info(f"Loaded {len(self._factors)} LCA factors from {self._file_name}")
+
+    def _read(self):
+        """
+        :return: The factors saved in the file, None if there are none for this impact method
+        """
+        if not os.path.exists(self._file_name):
+            return None
+        with open(self._file_name, 'r') as in_file:
+            data = json.load(in_file)
+        if data.get("impact_method") != self._impact_method:
+            self._lgr.warn(f"Ignoring LCA factors in {self._file_name}, they use another impact method")
+            return None
+        return data["factors"]
+
+    @contextmanager
+    def _file_lock(self):
+        # Serializes read, merge and save between the workers sharing the file
+        self._make_dir()
+        with open(f"{self._file_name}.lock", 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _make_dir(self):
+        dir_path = os.path.dirname(self._file_name)
+        if dir_path != "" and not os.path.exists(dir_path):
+            os.makedirs(dir_path, exist_ok=True)
+
+    def _save(self):
+        data = {
+            "impact_method": self._impact_method,
+            "factors": self._factors
+        }
+        # Write then rename so other workers never read a partial file
+        tmp_name = f"{self._file_name}.{os.getpid()}.tmp"
+        with open(tmp_name, 'w') as out_file:
+            json.dump(data, out_file, indent=2)
+        os.replace(tmp_name, self._file_name)
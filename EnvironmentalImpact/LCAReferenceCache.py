@@ -0,0 +1,59 @@
+import threading
+import time
+import olca
+
+
+class LCAReferenceCache:
+    """
+    The openLCA impact method and product system references for each project
+    class.  These almost never change, so they are looked up once and kept
+    until they expire or are invalidated.
+    """
+    def __init__(self, logger, impact_method, product_systems, ttl):
+        """
+        :param impact_method: Name of the impact assessment method
+        :param product_systems: Project class to the name of its product system
+        :param ttl: Seconds a reference is kept before it is looked up again
+        """
+        self._lgr = logger
+        self._impact_method = impact_method
+        self._product_systems = product_systems
+        self._ttl = ttl
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def project_classes(self):
+        return list(self._product_systems.keys())
+
+    def get(self, client, project_class):
+        """
+        :return: The impact method and product system references for project_class.
+                 The product system is None for classes without one.
+        """
+        with self._lock:
+            entry = self._entries.get(project_class)
+        if entry is not None and entry[2] > time.monotonic():
+            return entry[0], entry[1]
+
+        self._lgr.info(f"Looking up LCA references for {project_class.__name__}")
+        impact_method = client.find(olca.ImpactMethod, self._impact_method)
+        product_system = None
+        system_name = self._product_systems.get(project_class)
+        if system_name is not None:
+            product_system = client.find(olca.ProductSystem, system_name)
+
+        # Don't keep a miss, the database may just not be open yet
+        if impact_method is not None and (system_name is None or product_system is not None):
+            with self._lock:
+                self._entries[project_class] = (impact_method, product_system, time.monotonic() + self._ttl)
+        return impact_method, product_system
+
+    def invalidate(self, project_class=None):
+        """
+        Forget the references for project_class, or for every class if None.
+        """
+        with self._lock:
+            if project_class is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(project_class, None)
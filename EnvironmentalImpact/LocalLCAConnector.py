@@ -0,0 +1,90 @@
+import numpy as np
+from Common.Cache import canonical_key
+from Common.Config import get_config
+from EnvironmentalImpact.LCAConnector import IMPACT_METHOD, PRODUCT_SYSTEMS
+from EnvironmentalImpact.LCAFactorCache import LCAFactorCache
+from Projects.GenericProject import IProject
+
+
+class LocalLCAConnector:
+    """
+    Stands in for LCAConnector when there is no openLCA server.  Answers from
+    the per unit factor table that LCAConnector writes in linear mode
+    (LCA_FACTOR_FILE), so results match openLCA for the same database and
+    impact method.  Build the table once against openLCA with
+    LCAConnector.refresh_factors().
+    """
+    def __init__(self, logger, factors: LCAFactorCache = None):
+        self._lgr = logger
+        self._file_name = get_config().LCA_FACTOR_FILE
+        if factors is None:
+            factors = LCAFactorCache(logger, self._file_name, IMPACT_METHOD)
+        self._factors = factors
+
+    def prewarm(self):
+        missing = [name for name in PRODUCT_SYSTEMS.values() if self._factors.get(name) is None]
+        if len(missing) > 0:
+            self._lgr.warn(f"No local LCA factors for {missing}")
+            return False
+        return True
+
+    def get_status(self):
+        return {
+            "backend": "local",
+            "factors": len(self._factors.factors())
+        }
+
+    def is_linear(self):
+        return True
+
+    def version(self):
+        """
+        :return: Changes whenever the LCA results can change
+        """
+        return canonical_key("local", IMPACT_METHOD, self._factors.factors())
+
+    def invalidate_references(self, project_class=None):
+        pass
+
+    def refresh_factors(self):
+        """
+        Re-read the factor table, e.g. after a new one was exported.
+        """
+        self._factors = LCAFactorCache(self._lgr, self._file_name, IMPACT_METHOD)
+        missing = [name for name in PRODUCT_SYSTEMS.values() if self._factors.get(name) is None]
+        return len(missing) == 0, [f"No local LCA factor for {name}" for name in missing]
+
+    def get_co2_factor(self, project_class, deadline=None):
+        """
+        :param deadline: Unused, the lookup never waits
+        :return: CO2 emissions in KG per functional unit of the project's product system
+        """
+        system_name = PRODUCT_SYSTEMS.get(project_class)
+        if system_name is None:
+            raise ValueError(f"No LCA product system for {project_class.__name__}")
+        factor = self._factors.get(system_name)
+        if factor is None:
+            raise ValueError(f"No local LCA factor for {system_name}")
+        return factor
+
+    def get_co2_batch(self, amounts, project_class, deadline=None):
+        """
+        :param amounts: Functional unit amounts, one per project
+        :param deadline: Unused, the lookup never waits
+        :return: (True, numpy array of CO2 emissions in KG) or (False, error message)
+        """
+        try:
+            return True, self.get_co2_factor(project_class) * np.asarray(amounts, dtype=float)
+        except ValueError as e:
+            return False, str(e)
+
+    def get_co2(self, surface_area, project: IProject, deadline=None):
+        """
+        :param surface_area: Functional unit amount of the project
+        :param deadline: Unused, the lookup never waits
+        :return: (True, CO2 emissions in KG) or (False, error message)
+        """
+        try:
+            return True, self.get_co2_factor(type(project)) * surface_area
+        except ValueError as e:
+            return False, str(e)
@@ -1,22 +1,125 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from Common.Cache import LRUCache, DiskStore, canonical_key
+from Common.Config import get_config
 from Common.Logger import Logger
 from Projects.GenericProject import IProject
 from EnvironmentalImpact.CO2Predictor import CO2Predictor
 from EnvironmentalImpact.LCAConnector import LCAConnector
+from EnvironmentalImpact.LocalLCAConnector import LocalLCAConnector
+
+
+def get_lca_connector(logger: Logger):
+    if get_config().LCA_BACKEND == "local":
+        return LocalLCAConnector(logger)
+    return LCAConnector(logger)
 
 
 def get_impact_predictor(logger: Logger):
-    lca = LCAConnector(logger)
+    lca = get_lca_connector(logger)
+    lca.prewarm()
     co2 = CO2Predictor(logger, lca)
     ip = ImpactPredictor(logger, co2)
     return ip
 
 
 class ImpactPredictor:
-    def __init__(self, logger: Logger, co2: CO2Predictor):
+    def __init__(self, logger: Logger, co2: CO2Predictor, executor: ThreadPoolExecutor = None,
+                 cache: LRUCache = None):
         self.logger = logger
         self._co2 = co2
+        cfg = get_config()
+        self._lca_timeout = cfg.LCA_TIMEOUT_SECS
+        self._request_timeout = cfg.REQUEST_DEADLINE_SECS
+        # Method b waits on the LCA system, so it runs here while method a runs on the caller's thread
+        if executor is None:
+            executor = ThreadPoolExecutor(max_workers=cfg.LCA_POOL_SIZE, thread_name_prefix="lca")
+        self._executor = executor
+        if cache is None:
+            store = None
+            if cfg.CO2_CACHE_DIR != "":
+                store = DiskStore(cfg.CO2_CACHE_DIR, cfg.CO2_CACHE_DIR_FILES, cfg.CO2_CACHE_TTL_SECS)
+            cache = LRUCache(cfg.CO2_CACHE_SIZE, cfg.CO2_CACHE_TTL_SECS, store)
+        self._cache = cache
+
+    def get_status(self):
+        return {
+            "LCA": self._co2.lca.get_status(),
+            "CO2Cache": self._cache.stats()
+        }
 
-    def get_co2(self, project: IProject):
+    def request_deadline(self):
+        return time.monotonic() + self._request_timeout
+
+    def get_co2(self, project: IProject, deadline=None):
+        key = self._cache_key(project, self._co2.version())
+        result = self._cache.get(key)
+        if result is not None:
+            return result
+
+        if deadline is None:
+            deadline = self.request_deadline()
         ok_a, co2_a = self._co2.co2_emissions_method_a(project)
-        ok_b, co2_b = self._co2.co2_emissions_method_b(project)
-        return ok_a, ok_b, co2_a, co2_b
+        call_b = self._submit(self._co2.co2_emissions_method_b, project, deadline)
+        ok_b, co2_b = self._wait_for(call_b, deadline)
+        result = ok_a, ok_b, co2_a, co2_b
+        self._cache_result(key, result)
+        return result
+
+    def get_co2_batch(self, projects, deadline=None):
+        """
+        :param projects: Projects that are all of the same type
+        :return: (ok_a, ok_b, co2_a, co2_b) for each project, in order
+        """
+        version = self._co2.version()
+        keys = [self._cache_key(project, version) for project in projects]
+        results = [self._cache.get(key) for key in keys]
+        missing = [idx for idx, result in enumerate(results) if result is None]
+        if len(missing) == 0:
+            return results
+
+        if deadline is None:
+            deadline = self.request_deadline()
+        missing_projects = [projects[idx] for idx in missing]
+        # Method a first, if it raises no LCA work has been queued for a caller that retries per project
+        ok_a, co2_a = self._co2.co2_emissions_method_a_batch(missing_projects)
+        if self._co2.batches_method_b(missing_projects):
+            # A linear LCA backend answers the whole batch with one lookup
+            call_b = self._submit(self._co2.co2_emissions_method_b_batch, missing_projects, deadline)
+            ok_b, co2_b = self._wait_for(call_b, deadline)
+            results_b = co2_b if ok_b else [(False, co2_b)] * len(missing)
+        else:
+            method_b = self._co2.co2_emissions_method_b
+            calls_b = [self._submit(method_b, project, deadline) for project in missing_projects]
+            results_b = [self._wait_for(call_b, deadline) for call_b in calls_b]
+
+        for pos, (ok_b, co2_b) in enumerate(results_b):
+            idx = missing[pos]
+            results[idx] = (ok_a, ok_b, co2_a[pos], co2_b)
+            self._cache_result(keys[idx], results[idx])
+        return results
+
+    @staticmethod
+    def _cache_key(project, version):
+        return canonical_key(version, project.to_json())
+
+    def _cache_result(self, key, result):
+        # Failures, e.g. the LCA system timing out, are retried on the next request
+        ok_a, ok_b, _, _ = result
+        if ok_a and ok_b:
+            self._cache.put(key, result)
+
+    def _submit(self, method_b, project, deadline):
+        # project is the list of projects for the batch method
+        call_deadline = min(time.monotonic() + self._lca_timeout, deadline)
+        future = self._executor.submit(method_b, project, call_deadline)
+        return future, call_deadline
+
+    def _wait_for(self, call, deadline):
+        future, call_deadline = call
+        try:
+            return future.result(timeout=max(0.0, min(call_deadline, deadline) - time.monotonic()))
+        except TimeoutError:
+            future.cancel()
+            self.logger.warn("Timed out waiting for the LCA system")
+            return False, "LCA system timed out"
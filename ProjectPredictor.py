@@ -1,31 +1,76 @@
+import os
+import sys
+from Common.Cache import LRUCache, DiskStore, canonical_key
+from Common.Config import get_config
 from Common.Logger import Logger
 
 from Projects.ProjectTypes import ProjectType
 from Projects.ProjectBuilder import ProjectBuilder
 from DescriptionProcessing.CBERT.BertPreprocessing import BertPreprocessor
-from DescriptionProcessing.CBERT.CBertModel import CBert
+from DescriptionProcessing.CBERT.BatchingPredictor import BatchingPredictor
+
+
+MODEL_VERSION = "CV0.1"
 
 
 def get_project_predictor(logger, bpp: BertPreprocessor, pb: ProjectBuilder):
-    num_labels = ProjectType.num_sectors()
-    cbert = CBert(logger, num_labels, "models", "CV0.1")
-    pp = ProjectPredictor(logger, bpp, cbert, pb)
+    cfg = get_config()
+    cbert = _load_classifier(logger, cfg.BERT_BACKEND, cfg.BERT_THREADS)
+    batcher = BatchingPredictor(logger, cbert, cfg.BERT_BATCH_SIZE, cfg.BERT_BATCH_WAIT_MS)
+    store = None
+    if cfg.BERT_CACHE_DIR != "":
+        store = DiskStore(cfg.BERT_CACHE_DIR, cfg.BERT_CACHE_DIR_FILES, cfg.BERT_CACHE_TTL_SECS)
+    cache = LRUCache(cfg.BERT_CACHE_SIZE, cfg.BERT_CACHE_TTL_SECS, store, size_of=_sectors_size)
+    version = weights_version(cbert.weights_file, cfg.BERT_BACKEND)
+    pp = ProjectPredictor(logger, bpp, batcher, pb, cache, version)
     return pp
 
 
+def weights_version(weights_file, backend):
+    """
+    Retraining writes new weights into the same model directory, so cached
+    predictions are keyed by the weights file itself.
+    :return: Changes whenever the weights file is rewritten
+    """
+    stat = os.stat(weights_file)
+    # Each backend gives slightly different probabilities, so it is part of the version
+    return canonical_key(MODEL_VERSION, backend, os.path.basename(weights_file), stat.st_mtime_ns, stat.st_size)
+
+
+def _sectors_size(sectors):
+    return sys.getsizeof(sectors) + sum(sys.getsizeof(k) + sys.getsizeof(v) for k, v in sectors.items())
+
+
+def _load_classifier(logger, backend, num_threads):
+    # Only import the backend in use, the ONNX backend doesn't need the torch model code
+    if backend in ("onnx", "onnx-int8"):
+        from DescriptionProcessing.CBERT.OnnxBert import OnnxBert
+        return OnnxBert(logger, "models", MODEL_VERSION, quantized=backend == "onnx-int8", num_threads=num_threads)
+
+    from DescriptionProcessing.CBERT.CBertModel import CBert
+    num_labels = ProjectType.num_sectors()
+    return CBert(logger, num_labels, "models", MODEL_VERSION, backend, num_threads)
+
+
 class ProjectPredictor:
-    def __init__(self, logger: Logger, bpp: BertPreprocessor, cbert: CBert, project_builder: ProjectBuilder):
+    def __init__(self, logger: Logger, bpp: BertPreprocessor, cbert: BatchingPredictor, project_builder: ProjectBuilder,
+                 cache: LRUCache, model_version):
         self._lgr = logger
         self._bpp = bpp
         self._cbert = cbert
         self._pb = project_builder
+        self._cache = cache
+        self._model_version = model_version
+
+    def get_status(self):
+        return {
+            "BERT": self._cbert.get_status(),
+            "BERTCache": self._cache.stats()
+        }
 
     def find_project_from_description(self, description, sector_name=None):
         if sector_name is None:
-            in_text = [description, ]
-            input_ids, attention_masks = self._bpp.preprocess_data(in_text)
-            results = self._cbert.predict(input_ids, attention_masks)
-            project_types = ProjectType.translate_prediction(results)
+            project_types = self._predict_sectors(description)
             project_types = self._get_top_2(project_types)
             results = {}
             for t, v in project_types:
@@ -37,6 +82,21 @@ class ProjectPredictor:
 
         return results
 
+    def _predict_sectors(self, description):
+        """
+        :return: Probability of each sector, cached by the normalized description
+        """
+        # The model is uncased and ignores runs of whitespace
+        normalized = " ".join(description.lower().split())
+        key = canonical_key(self._model_version, normalized)
+        sectors = self._cache.get(key)
+        if sectors is None:
+            input_ids, attention_masks = self._bpp.preprocess_data([description], pad_to_longest=True)
+            results = self._cbert.predict(input_ids, attention_masks)
+            sectors = ProjectType.translate_prediction(results)
+            self._cache.put(key, sectors)
+        return sectors
+
     def _get_project_for_type(self, project_type, confidence, description):
         cur_project = {'confidence': confidence}
         ok, project = self._pb.from_project_type(project_type)
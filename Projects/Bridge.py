@@ -1,6 +1,7 @@
 import EnvironmentalImpact.ImpactConversions as cvt
 from EnvironmentalImpact.UnitConversions import FEET, SQR_FEET, TONS
 from Projects.IProject import IProject
+from Projects.CalculationPlan import CalculationPlan
 from Projects.Rules import REQUIRED_DESCRIPTORS, CALCULATED_DESCRIPTORS, FACTS, RULES, PROJECT_TYPE
 from Projects.Rules import LENGTH, LANES
 from Projects.Rules import WIDTH, SURFACE_AREA, TONS_CONCRETE, TONS_STEEL
@@ -43,9 +44,11 @@ BRIDGE_DATA = {
 
 
 class Bridge(IProject):
+    PLAN = CalculationPlan(BRIDGE_DATA)
+
     def __init__(self, logger):
         super().__init__(logger)
-        self._init(BRIDGE_DATA)
+        self._init(self.PLAN)
 
     @staticmethod
     def from_json(logger, json_dict):
@@ -0,0 +1,82 @@
+from types import MappingProxyType
+import numpy as np
+from Projects.Rules import REQUIRED_DESCRIPTORS, CALCULATED_DESCRIPTORS, FACTS, RULES, PROJECT_TYPE
+from RulesEngine.RulesEngine import Rule, RuleGraph
+
+
+class CalculationPlan:
+    """
+    The parts of a project type that never change between instances: its
+    descriptors, default facts and compiled rules.  Built once per type, each
+    project then only supplies the parameter values it has forced.
+    """
+    def __init__(self, data_map):
+        self.project_type = data_map[PROJECT_TYPE]
+        self.required_descriptors = tuple(data_map[REQUIRED_DESCRIPTORS])
+        self.calculated_descriptors = tuple(data_map[CALCULATED_DESCRIPTORS])
+        self.facts = MappingProxyType(dict(data_map[FACTS]))
+        self.rules = tuple(Rule(r_txt) for r_txt in data_map[RULES])
+        self._graph = RuleGraph(self.rules, self.facts.keys())
+        self._overridable = frozenset(self.facts.keys()) | {r.left for r in self.rules}
+
+    def evaluate(self, forced):
+        """
+        :param forced: Parameter name to value for every forced parameter
+        :return: Every fact and calculated variable to its value
+        """
+        values = dict(self.facts)
+        for name, value in forced.items():
+            if name in self._overridable:
+                values[name] = value
+
+        derived = self._graph.evaluate(values)
+        for name, vals in derived.items():
+            if name not in values:
+                values[name] = vals[0]
+        return values
+
+    def update(self, values, forced, changed):
+        """
+        Recalculate only what depends on the changed parameters.
+        :param values: Result of an earlier evaluate, updated in place
+        :param forced: Parameter name to value for every forced parameter
+        :param changed: Names of the parameters that changed since values was calculated
+        :return: Names whose value was updated
+        """
+        changed = [name for name in changed if name in self._overridable]
+        for name in changed:
+            if name in forced:
+                values[name] = forced[name]
+            elif name in self.facts:
+                values[name] = self.facts[name]
+
+        fixed = set(self.facts.keys())
+        fixed.update(name for name in forced.keys() if name in self._overridable)
+        recalculated = self._graph.recalculate(values, changed, fixed)
+        return set(changed).union(recalculated)
+
+    def evaluate_batch(self, columns):
+        """
+        Evaluate the rules once over whole columns of parameters.  The rules are
+        plain arithmetic, so numpy arrays flow through them element-wise.
+        :param columns: Parameter name to a sequence of values, one per project.
+                        Parameters without a column use the type's default.
+        :return: (True, calculated descriptor name to numpy array) or (False, errors)
+        """
+        err = []
+        descriptors = {p[0] for p in self.required_descriptors + self.calculated_descriptors}
+        for name in columns.keys():
+            if name not in descriptors:
+                err.append(f"'{name}' is not a parameter of {self.project_type}.")
+        lengths = {len(col) for col in columns.values()}
+        if len(lengths) != 1:
+            err.append("Batch requires at least one parameter and all parameters of the same length.")
+        if len(err) > 0:
+            return False, err
+
+        num_rows = lengths.pop()
+        values = self.evaluate({name: np.asarray(col) for name, col in columns.items()})
+        results = {}
+        for name, _ in self.calculated_descriptors:
+            results[name] = np.broadcast_to(values[name], (num_rows,))
+        return True, results
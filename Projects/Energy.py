@@ -1,5 +1,6 @@
 from EnvironmentalImpact.UnitConversions import MEGAWATTS, FEET, SQR_FEET, TONS
 from Projects.IProject import IProject
+from Projects.CalculationPlan import CalculationPlan
 from Projects.Rules import ENERGY_TYPE, POWER_OUTPUT
 from Projects.Rules import REQUIRED_DESCRIPTORS, CALCULATED_DESCRIPTORS, FACTS, RULES, PROJECT_TYPE
 from Projects.Rules import SURFACE_AREA, TONS_CONCRETE, TONS_STEEL, AREA
@@ -48,8 +49,8 @@ ENERGY_DATA = {
     },
     RULES: [
         f"number_turbines = (({AREA} / sq_ft_in_acre ) / acres_per_MW) / MW_per_turbine",
-        f"number_solar_panels = ({AREA} / sq_feet_per_panel",
-        f"kg_coal = (({POWER_OUTPUT} / MW_from_coal) * to_tons) / to_kg",
+        f"number_solar_panels = {AREA} / sq_feet_per_panel",
+        f"kg_coal = (({POWER_OUTPUT} / MW_from_coal) * lbs_per_ton) / to_kg",
         f"g_uranium = {POWER_OUTPUT} / 1",
         f"kg_concrete = {POWER_OUTPUT} / lbs_per_ton * yd3_concrete * kg_to_yd3",
         f"{TONS_CONCRETE} = kg_concrete / kg_per_ton",
@@ -60,9 +61,11 @@ ENERGY_DATA = {
 
 
 class Energy(IProject):
+    PLAN = CalculationPlan(ENERGY_DATA)
+
     def __init__(self, logger):
         super().__init__(logger)
-        self._init(ENERGY_DATA)
+        self._init(self.PLAN)
 
     @staticmethod
     def from_json(logger, json_dict):
@@ -1,5 +1,6 @@
 from Common.Logger import Logger
 from Projects.IProject import IProject
+from Projects.CalculationPlan import CalculationPlan
 from Projects.Rules import REQUIRED_DESCRIPTORS, CALCULATED_DESCRIPTORS, FACTS, RULES, PROJECT_TYPE
 from Projects.Rules import GALLONS_DIESEL, TONS_CONCRETE
 from EnvironmentalImpact.UnitConversions import GALLONS, TONS
@@ -23,9 +24,11 @@ GENERIC_PROJECT_DATA = {
 
 
 class GenericProject(IProject):
+    PLAN = CalculationPlan(GENERIC_PROJECT_DATA)
+
     def __init__(self, logger):
         super().__init__(logger)
-        self._init(GENERIC_PROJECT_DATA)
+        self._init(self.PLAN)
 
     @staticmethod
     def from_json(logger: Logger, json_dict: dict):
@@ -1,8 +1,7 @@
 # from __future__ import annotations
 from abc import ABC, abstractmethod
 from Common.Logger import Logger
-from Projects.Rules import REQUIRED_DESCRIPTORS, CALCULATED_DESCRIPTORS, FACTS, RULES, PROJECT_TYPE
-from RulesEngine.RulesEngine import RulesEngine, Rule, Fact
+from Projects.CalculationPlan import CalculationPlan
 
 
 class Parameter:
@@ -20,15 +19,16 @@ class IProject(ABC):
         self._calculated_parameters = {}
         self._project_type = None
         self.__description_parser = None
-        self.__data_map = None
+        self.__plan = None
+        self.__values = None
 
-    def _init(self, data_map):
-        self.__data_map = data_map
-        self._project_type = data_map[PROJECT_TYPE]
-        for p in data_map[REQUIRED_DESCRIPTORS]:
+    def _init(self, plan: CalculationPlan):
+        self.__plan = plan
+        self._project_type = plan.project_type
+        for p in plan.required_descriptors:
             param = Parameter(p[0], None, p[1])
             self._base_parameters[param.name] = param
-        for p in data_map[CALCULATED_DESCRIPTORS]:
+        for p in plan.calculated_descriptors:
             param = Parameter(p[0], None, p[1])
             self._calculated_parameters[param.name] = param
         self._recalculate()
@@ -41,13 +41,29 @@ class IProject(ABC):
             err_msg = "Description Parser not set, cannot parse descriptions"
             self.lgr.error(err_msg)
             return False, [err_msg]
+        changed = []
         for param in self._base_parameters.keys():
             ok, val = self.__description_parser.get_param(param, description)
             if ok:
                 p = self._base_parameters[param]
                 p.value = val
                 p.forced = True
-        self._recalculate()
+                changed.append(param)
+        self._recalculate(changed)
+        return True, []
+
+    def set_param_value(self, param_name, value):
+        """
+        Force a single parameter and recalculate only the parameters that depend on it.
+        """
+        p = self.get_param(param_name)
+        if p is None:
+            err_msg = f"'{param_name}' is not a parameter of {self._project_type}"
+            self.lgr.error(err_msg)
+            return False, [err_msg]
+        p.value = value
+        p.forced = True
+        self._recalculate([param_name])
         return True, []
 
     def get_param_value(self, param_name):
@@ -84,45 +100,46 @@ class IProject(ABC):
         json_dict["project_type"] = self._project_type
         return json_dict
 
-    def _recalculate(self):
-        e = RulesEngine()
-        project_facts = self.__data_map[FACTS]
-        project_rules = self.__data_map[RULES]
-        for f in project_facts.keys():
-            v_var = self.get_param(f)
-            if v_var is not None and v_var.forced:
-                e.add_fact(Fact("has_value", f, v_var.value))
-            else:
-                e.add_fact(Fact("has_value", f, project_facts[f]))
-        for r_txt in project_rules:
-            r = Rule(r_txt)
-            var_name = r.left
-            v_var = self.get_param(var_name)
-            if v_var is not None and v_var.forced:
-                e.add_fact(Fact("has_value", var_name, v_var.value))
-            e.add_rule(r)
-
-        for p_name in self._base_parameters.keys():
-            self.get_param(p_name).value = e.query("has_value", p_name)[0]
-        for p_name in self._calculated_parameters.keys():
-            self.get_param(p_name).value = e.query("has_value", p_name)[0]
+    def _recalculate(self, changed=None):
+        """
+        :param changed: Names of the parameters that changed, None to recalculate everything
+        """
+        forced = {}
+        for params in (self._base_parameters, self._calculated_parameters):
+            for p in params.values():
+                if p.forced:
+                    forced[p.name] = p.value
+
+        if changed is None or self.__values is None:
+            self.__values = self.__plan.evaluate(forced)
+            updated = self.__values.keys()
+        else:
+            updated = self.__plan.update(self.__values, forced, changed)
+
+        for p_name in updated:
+            p = self.get_param(p_name)
+            if p is not None:
+                p.value = self.__values[p_name]
 
     def _build_from_json(self, json_dict: dict):
         ok, err = self._verify_json(json_dict)
         if not ok:
             return False, err
 
+        changed = []
         for param_name in self._base_parameters.keys():
             p = self._base_parameters[param_name]
             p.value = json_dict[param_name]
             p.forced = True
+            changed.append(param_name)
 
         for param_name in self._calculated_parameters.keys():
             if param_name in json_dict:
                 p = self._calculated_parameters[param_name]
                 p.value = json_dict[param_name]
                 p.forced = True
-        self._recalculate()
+                changed.append(param_name)
+        self._recalculate(changed)
         return True, self
 
     def _verify_json(self, json_dict):
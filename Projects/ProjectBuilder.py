@@ -36,6 +36,21 @@ class ProjectBuilder:
             return True, p
         return False, []
 
+    def calculate_batch(self, project_type, columns: dict) -> (bool, object):
+        """
+        Calculate the descriptors of many projects of one type in a single pass.
+        :param project_type: Type of every project in the batch
+        :param columns: Parameter name to a sequence of values, one per project
+        :return: (True, calculated descriptor name to numpy array) or (False, errors)
+        """
+        valid_types = self._project_type_to_project
+        if project_type.lower() not in valid_types:
+            err = f"'project_type' required and must be one of {valid_types.keys()}"
+            return False, err
+
+        p_class = valid_types[project_type.lower()]
+        return p_class.PLAN.evaluate_batch(columns)
+
     def from_json(self, json_dict: dict) -> (bool, object):
         valid_types = self._project_type_to_project
         if "project_type" not in json_dict:
@@ -1,6 +1,7 @@
 import EnvironmentalImpact.ImpactConversions as cvt
 from EnvironmentalImpact.UnitConversions import FEET, SQR_FEET, TONS, ft_per_meter, kg_per_pound, ft_per_mile, ft_per_yard
 from Projects.IProject import IProject
+from Projects.CalculationPlan import CalculationPlan
 from Projects.Rules import REQUIRED_DESCRIPTORS, CALCULATED_DESCRIPTORS, FACTS, RULES, PROJECT_TYPE, TONS_TIMBER
 from Projects.Rules import LENGTH, LANES
 from Projects.Rules import WIDTH, TONS_CONCRETE, TONS_STEEL, TONS_BALLAST
@@ -98,9 +99,11 @@ RAILWAY_DATA = {
 
 
 class Railway(IProject):
+    PLAN = CalculationPlan(RAILWAY_DATA)
+
     def __init__(self, logger):
         super().__init__(logger)
-        self._init(RAILWAY_DATA)
+        self._init(self.PLAN)
 
     @staticmethod
     def from_json(logger, json_dict):
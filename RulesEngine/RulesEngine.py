@@ -1,3 +1,45 @@
+import ast
+import functools
+from collections import defaultdict
+
+HAS_VALUE = "has_value"
+
+# Rules are plain arithmetic, anything else is rejected when the rule is compiled
+_ALLOWED_NODES = (
+    ast.Expression, ast.Name, ast.Load, ast.Constant, ast.BinOp, ast.UnaryOp,
+    ast.Add, ast.Sub, ast.Mult, ast.Div, ast.FloorDiv, ast.Mod, ast.Pow, ast.UAdd, ast.USub,
+)
+_NO_BUILTINS = {"__builtins__": {}}
+
+
+class RuleError(Exception):
+    pass
+
+
+@functools.lru_cache(maxsize=None)
+def compile_expression(expression):
+    """
+    Parse an arithmetic expression once and cache it by its text.
+    :return: The compiled code object and the variables it uses, in order of first use
+    """
+    try:
+        tree = ast.parse(expression, mode="eval")
+    except SyntaxError as e:
+        raise RuleError(f"Cannot parse '{expression}': {e.msg}")
+
+    names = []
+    for node in ast.walk(tree):
+        if not isinstance(node, _ALLOWED_NODES):
+            raise RuleError(f"'{expression}' uses unsupported {type(node).__name__}")
+        if isinstance(node, ast.Constant) and not isinstance(node.value, (int, float)):
+            raise RuleError(f"'{expression}' uses unsupported constant {node.value!r}")
+        if isinstance(node, ast.Name):
+            names.append(node)
+    names.sort(key=lambda n: n.col_offset)
+    variables = tuple(dict.fromkeys(n.id for n in names))
+
+    code = compile(tree, "<rule>", "eval")
+    return code, variables
 
 
 class Fact:
@@ -11,8 +53,112 @@ class Rule:
     def __init__(self, rule_text):
         self._rule_text = rule_text
         parts = rule_text.split("=")
+        if len(parts) != 2 or not parts[0].strip().isidentifier():
+            raise RuleError(f"Rule '{rule_text}' must be of the form 'name = expression'")
         self.left = parts[0].strip()
         self.right = parts[1].strip()
+        self._code, self.variables = compile_expression(self.right)
+
+    def evaluate(self, values):
+        return eval(self._code, _NO_BUILTINS, values)
+
+    def __str__(self):
+        return self._rule_text
+
+
+class RuleGraph:
+    """
+    Rules compiled into a dependency graph.  Every derived variable is
+    evaluated exactly once, in topological order.
+    """
+    def __init__(self, rules, known_names):
+        self._rules_by_left = defaultdict(list)
+        for r in rules:
+            self._rules_by_left[r.left].append(r)
+        self._known_names = frozenset(known_names)
+        self._check_defined()
+        self.order = self._topological_order()
+
+        # Variable name to the derived variables that use it directly
+        self._dependents = defaultdict(set)
+        for left, rules in self._rules_by_left.items():
+            for r in rules:
+                for var in r.variables:
+                    self._dependents[var].add(left)
+
+    def evaluate(self, values):
+        """
+        :param values: Variable name to value for every known fact
+        :return: Derived variable name to the list of values its rules produced
+        """
+        scope = dict(values)
+        results = {}
+        for left in self.order:
+            vals = [r.evaluate(scope) for r in self._rules_by_left[left]]
+            results[left] = vals
+            # A fact for the variable takes precedence over the calculated value
+            if left not in scope:
+                scope[left] = vals[0]
+        return results
+
+    def downstream(self, names):
+        """
+        :param names: Variables whose value changed
+        :return: Derived variables that are, or depend on, any of names, in evaluation order
+        """
+        dirty = {n for n in names if n in self._rules_by_left}
+        pending = list(names)
+        while pending:
+            for d in self._dependents.get(pending.pop(), ()):
+                if d not in dirty:
+                    dirty.add(d)
+                    pending.append(d)
+        return [left for left in self.order if left in dirty]
+
+    def recalculate(self, scope, changed, fixed):
+        """
+        Re-evaluate, in place, only the derived variables affected by a change.
+        :param scope: Current value of every variable, updated in place
+        :param changed: Variables whose value changed
+        :param fixed: Variables held by a fact, their rules don't override them
+        :return: Derived variables that were re-evaluated
+        """
+        dirty = [left for left in self.downstream(changed) if left not in fixed]
+        for left in dirty:
+            scope[left] = self._rules_by_left[left][0].evaluate(scope)
+        return dirty
+
+    def _check_defined(self):
+        for rules in self._rules_by_left.values():
+            for r in rules:
+                for var in r.variables:
+                    if var not in self._known_names and var not in self._rules_by_left:
+                        raise RuleError(f"Rule '{r}' uses undefined variable '{var}'")
+
+    def _topological_order(self):
+        # Kahn's algorithm over the derived variables
+        dependents = defaultdict(list)
+        pending = {}
+        for left, rules in self._rules_by_left.items():
+            inputs = {var for r in rules for var in r.variables if var in self._rules_by_left}
+            pending[left] = len(inputs)
+            for var in inputs:
+                dependents[var].append(left)
+
+        ready = [left for left, count in pending.items() if count == 0]
+        order = []
+        while ready:
+            left = ready.pop(0)
+            order.append(left)
+            for d in dependents[left]:
+                pending[d] -= 1
+                if pending[d] == 0:
+                    ready.append(d)
+
+        if len(order) != len(pending):
+            cycle = sorted(left for left, count in pending.items() if count > 0)
+            raise RuleError(f"Rules contain a cycle between {cycle}")
+        return order
 
 
 class RulesEngine:
@@ -20,6 +166,18 @@ class RulesEngine:
         self._facts = []
         self._rules = []
 
+        # Facts are indexed both ways so lookups don't scan the whole list:
+        #   (relation, first)  -> [second, ...]   used by query
+        #   (relation, second) -> [first, ...]    used by query_post
+        # Each bucket keeps insertion order so results match a linear scan.
+        self._facts_by_first = defaultdict(list)
+        self._facts_by_second = defaultdict(list)
+        self._value_names = set()
+
+        # Compiled rules and the values they produced, rebuilt on change
+        self._graph = None
+        self._derived = None
+
         self._default_val = None
         self.replace_none_with_default = False
 
@@ -34,54 +192,56 @@ class RulesEngine:
         if self.replace_none_with_default and fact.second is None:
             fact.second = self._default_val
         self._facts.append(fact)
+        self._facts_by_first[(fact.relation, fact.first)].append(fact.second)
+        self._facts_by_second[(fact.relation, fact.second)].append(fact.first)
+        if fact.relation == HAS_VALUE:
+            self._derived = None
+            if fact.first not in self._value_names:
+                self._value_names.add(fact.first)
+                self._graph = None
 
     def rule_count(self):
         return len(self._rules)
 
     def add_rule(self, rule: Rule):
         self._rules.append(rule)
+        self._graph = None
+        self._derived = None
+
+    def compile(self) -> RuleGraph:
+        """
+        Build the dependency graph for the current rules and facts.
+        Raises RuleError if a rule uses an undefined variable or the rules form a cycle.
+        """
+        if self._graph is None:
+            self._graph = RuleGraph(self._rules, self._value_names)
+        return self._graph
 
     def query(self, relation, first):
         return self._query_default(relation, first)
 
     def _query_default(self, relation, first):
         results = []
-        for f in self._facts:
-            if f.relation == relation and f.first == first:
-                results.append(f.second)
-                results += self._query_default(relation, f.second)
-
-        # Now eval rules
-        if relation == "has_value":
-            for r in self._rules:
-                if r.left == first:
-                    self._set_vals(r.right)
-                    self_calc = self._add_self_to_vars(r.right)
-                    val = eval(self_calc)
-                    self.add_fact(Fact("has_value", first, val))
-                    results.append(val)
+        for second in self._facts_by_first.get((relation, first), []):
+            results.append(second)
+            results += self._query_default(relation, second)
+
+        # Now add calculated values
+        if relation == HAS_VALUE and len(self._rules) > 0:
+            results += self._get_derived().get(first, [])
 
         return results
 
     def query_post(self, relation, second):
         results = []
-        for f in self._facts:
-            if f.relation == relation and f.second == second:
-                results.append(f.first)
-                results += self.query_post(relation, f.first)
+        for first in self._facts_by_second.get((relation, second), []):
+            results.append(first)
+            results += self.query_post(relation, first)
         return results
 
-    def _set_vals(self, calculation):
-        for var in calculation.split():
-            v_val = self._query_default("has_value", var)
-            if len(v_val) > 0:
-                self.__dict__[var] = v_val[0]
-
-    def _add_self_to_vars(self, calculation):
-        self_calculation = ""
-        for var in calculation.split():
-            if len(var) > 1:
-                self_calculation += f" self.{var}"
-            else:
-                self_calculation += f" {var}"
-        return self_calculation
+    def _get_derived(self):
+        if self._derived is None:
+            graph = self.compile()
+            values = {name: self._facts_by_first[(HAS_VALUE, name)][0] for name in self._value_names}
+            self._derived = graph.evaluate(values)
+        return self._derived
@@ -18,8 +18,8 @@ def create_app():
     return flask_app
 
 
-# To run in production:
-# gunicorn -w 1 -b 127.0.0.1:{PORT} "app:create_app()"
+# To run in production, loading the model once and forking a worker per core:
+# gunicorn -c gunicorn.conf.py "app:create_app()"
 if __name__ == "__main__":
     app = create_app()
     app.run(host="0.0.0.0", port=PORT)
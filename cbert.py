@@ -19,7 +19,7 @@ def train_bert(logger: Logger, bpp: BertPreprocessor, ajp_data: ProjectDataset,
 
     # Model should be None on initial training, it will use the Base.
     cbert = CBert(logger, num_labels, "./models", None)
-    cbert.split_datasets(input_ids, attention_masks, labels)
+    cbert.split_datasets(input_ids, attention_masks, labels, bucket_by_length=True)
 
     stats = cbert.train()
     cbert.show_training_stats(stats)
@@ -38,6 +38,24 @@ def show_bert_accuracy(logger: Logger, bpp: BertPreprocessor, ajp_data: ProjectD
     cbert.total_accuracy()
 
 
+def check_quantized_accuracy(logger: Logger, bpp: BertPreprocessor, ajp_data: ProjectDataset, vers):
+    sentences, labels = ajp_data.get_training_data()
+    num_labels = ProjectType.num_sectors()
+
+    input_ids, attention_masks = bpp.preprocess_data(sentences)
+
+    cbert = CBert(logger, num_labels, "./models", vers)
+    cbert.split_datasets(input_ids, attention_masks, labels)
+
+    return cbert.quantized_accuracy()
+
+
+def export_bert(logger: Logger, vers):
+    num_labels = ProjectType.num_sectors()
+    cbert = CBert(logger, num_labels, "./models", vers)
+    return cbert.export_onnx(quantize=True)
+
+
 def run_bert(logger: Logger, bpp: BertPreprocessor, vers):
     num_labels = ProjectType.num_sectors()
 
@@ -62,6 +80,8 @@ def run():
     show_bert(logger, bpp, ajp_data)
     train_bert(logger, bpp, ajp_data, VERS)
     show_bert_accuracy(logger, bpp, ajp_data, VERS)
+    check_quantized_accuracy(logger, bpp, ajp_data, VERS)
+    export_bert(logger, VERS)
     run_bert(logger, bpp, VERS)
 
 
@@ -0,0 +1,32 @@
+import glob
+import os
+
+from Common.Logger import Logger
+from DescriptionProcessing.CBERT.CBertModel import CBert
+from Projects.ProjectTypes import ProjectType
+
+
+# One time conversion of the pickled models in models/bert_* to the formats
+# the serving backends load: model.safetensors and config.json, memory mapped
+# by CBert, and model.onnx and model.int8.onnx, served by OnnxBert.
+# model.pk and config.pkl are left in place.
+def convert_models(logger: Logger, models_dir):
+    num_labels = ProjectType.num_sectors()
+    for model_dir in sorted(glob.glob(f"{models_dir}/bert_*")):
+        if not os.path.exists(model_dir + "/model.pk"):
+            continue
+        vers = os.path.basename(model_dir)[len("bert_"):]
+        mapped = os.path.exists(model_dir + "/model.safetensors")
+        exported = os.path.exists(model_dir + "/model.onnx") and os.path.exists(model_dir + "/model.int8.onnx")
+        if mapped and exported:
+            logger.info(f"Model {vers} already converted")
+            continue
+        cbert = CBert(logger, num_labels, models_dir, vers)
+        if not mapped:
+            cbert.save_mapped()
+        if not exported:
+            cbert.export_onnx(quantize=True)
+
+
+if __name__ == "__main__":
+    convert_models(Logger("Convert"), "./models")
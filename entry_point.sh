@@ -2,4 +2,4 @@
 
 export LD_LIBRARY_PATH=/lib64
 cd /app
-gunicorn -w 1 -b 0.0.0.0:80 "app:create_app()"
+gunicorn -c gunicorn.conf.py "app:create_app()"
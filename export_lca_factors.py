@@ -0,0 +1,26 @@
+import sys
+
+from Common.Config import get_config
+from Common.Logger import Logger
+from EnvironmentalImpact.LCAConnector import LCAConnector
+
+
+# One time export of the per unit CO2 factor of every openLCA product system
+# to LCA_FACTOR_FILE (models/lca_factors.json by default).  Run it with the
+# openLCA IPC server up, whenever the database or impact method changes, then
+# upload the file next to the models so the image can serve LCA_BACKEND=local.
+def export_lca_factors(logger: Logger, lca: LCAConnector = None):
+    if lca is None:
+        lca = LCAConnector(logger)
+    ok, err = lca.refresh_factors()
+    if ok:
+        logger.info(f"Exported LCA factors to {get_config().LCA_FACTOR_FILE}")
+    else:
+        for e in err:
+            logger.error(e)
+    return ok
+
+
+if __name__ == "__main__":
+    if not export_lca_factors(Logger("LCAFactors")):
+        sys.exit(1)
@@ -0,0 +1,33 @@
+# gunicorn -c gunicorn.conf.py "app:create_app()"
+#
+# The app, with the BERT model and tokenizer, is loaded once in the master
+# and the workers are forked from it.  The weights are never written after
+# loading, so every worker shares the master's copy of them.
+import gc
+import multiprocessing
+import os
+
+bind = os.environ.get("BIND", "0.0.0.0:80")
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+# Threads let one worker take concurrent requests so their BERT predictions can be batched
+worker_class = "gthread"
+threads = int(os.environ.get("GUNICORN_THREADS", 4))
+preload_app = True
+
+# With a worker per core each model gets one core.  Set before the app is
+# loaded so the master never starts a thread pool that the forks would inherit.
+os.environ.setdefault("BERT_THREADS", "1")
+
+
+def pre_fork(server, worker):
+    # Move everything loaded so far out of the collector's reach.  Collections
+    # in the workers then don't write to, and so copy, the master's pages.
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    import torch
+    from Common.Config import get_config
+    num_threads = get_config().BERT_THREADS
+    if num_threads > 0:
+        torch.set_num_threads(num_threads)
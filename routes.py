@@ -1,4 +1,4 @@
-from flask import jsonify, request
+from flask import request
 from flask_cors import cross_origin
 from Controller import PredictorController
 
@@ -22,10 +22,7 @@ def add(log, app, ctl: PredictorController):
     @app.route('/internals/health', methods=['GET'])
     @cross_origin()
     def health():
-        resp = {
-            "Status": "Healthy"
-        }
-        return jsonify(resp), 200
+        return ctl.get_health()
 
     app = add_app_routes(app, ctl)
 
@@ -45,4 +42,8 @@ def add_app_routes(app, controller: PredictorController):
     def get_co2_from_project():
         return controller.get_impact_from_project(request)
 
+    @app.route("/api/project/co2/batch", methods=['POST'])
+    def get_co2_from_projects():
+        return controller.get_impact_from_projects(request)
+
     return app
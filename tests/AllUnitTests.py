@@ -1,10 +1,15 @@
-from tests.BertTests import BertTests
+from tests.BertTests import BertTests, BatchingPredictorTests, LengthBucketTests, CBertTests
+from tests.CacheTests import CacheTests
 from tests.DescriptionParsingTests import DescriptionParsingTests
 from tests.ImpactTests import TestImpact, TestCO2
+from tests.LCATests import LCAClientPoolTests, LCAReferenceCacheTests, LCAFactorTests, CircuitBreakerTests, \
+    LocalLCAConnectorTests
 from tests.ProjectBuilderTests import ProjectBuilderTests
 from tests.ProjectDescriptionsTests import ProjectDescriptionsTests
+from tests.ProjectPredictorTests import ProjectPredictorTests
 from tests.ProjectsTests import ProjectsTests, ProjectsJsonTests
 from tests.ProjectTypesTests import ProjectTypesTests
 from tests.RailwayTests import RailwayTests, RailwayJsonTests
 from tests.RulesTests import RulesTests, FactsTests
+from tests.StartupTests import StartupTests
 
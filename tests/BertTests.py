@@ -1,8 +1,24 @@
+import os
+import pickle
+import tempfile
+import threading
 import unittest
+from unittest import mock
 from parameterized import parameterized
 import numpy as np
+import torch
+import onnx
+from safetensors.torch import load_file, save_file
 
 from DescriptionProcessing.CBERT.BertPreprocessing import BertPreprocessor
+from DescriptionProcessing.CBERT.BatchingPredictor import BatchingPredictor
+from DescriptionProcessing.CBERT.LengthBuckets import LengthBucketSampler, trim_padding
+from DescriptionProcessing.CBERT.CBertModel import CBert
+from DescriptionProcessing.CBERT.OnnxBert import OnnxBert
+from transformers import BertConfig, BertForSequenceClassification
+from convert_models import convert_models
+from Projects.ProjectTypes import ProjectType
+from tests.Mocks import MockLogger
 
 
 class BertTests(unittest.TestCase):
@@ -60,6 +76,33 @@ class BertTests(unittest.TestCase):
         self.assertEqual(9, len(ids))
         self.assertEqual([101, 6160, 2000, 1996, 14324, 19204, 17629, 1012, 102], ids)
 
+    def test_batch_gives_tokens_ids_and_offsets(self):
+        # Arrange
+        sentences = ["Welcome to the bert tokenizer.", "I hope you have fun."]
+
+        # Act
+        results = self.bpp.tokenize_batch(sentences)
+
+        # Assert
+        tokens, ids, offsets = results[0]
+        self.assertEqual(['welcome', 'to', 'the', 'bert', 'token', '##izer', '.'], tokens)
+        self.assertEqual([101, 6160, 2000, 1996, 14324, 19204, 17629, 1012, 102], ids)
+        self.assertEqual([(0, 7), (8, 10), (11, 14), (15, 19), (20, 25), (25, 29), (29, 30)], offsets)
+        self.assertEqual(self.bpp.tokenize_one_sentence(sentences[1]), tuple(results[1][:2]))
+
+    def test_slow_tokenizer_gives_same_ids(self):
+        # Arrange
+        slow = BertPreprocessor(64, use_fast=False)
+        sentence = "Build a 150,000,000watt solar farm over 970 feet."
+
+        # Act
+        slow_tokens, slow_ids = slow.tokenize_one_sentence(sentence)
+        tokens, ids = self.bpp.tokenize_one_sentence(sentence)
+
+        # Assert
+        self.assertEqual(slow_tokens, tokens)
+        self.assertEqual(slow_ids, ids)
+
     def test_can_process_sentences_into_tokens(self):
         # Arrange
         sentences = ["Welcome to the bert tokenizer.", "I hope you have fun."]
@@ -95,6 +138,18 @@ class BertTests(unittest.TestCase):
         self._arrays_equal(np.ones(num_tokens), s2_mask[:num_tokens].numpy())
         self._arrays_equal(np.zeros(64 - num_tokens), s2_mask[num_tokens:].numpy())
 
+    def test_can_pad_to_longest_sentence(self):
+        # Arrange
+        sentences = ["Welcome to the bert tokenizer.", "I hope you have fun."]
+
+        # Act
+        ids, masks = self.bpp.preprocess_data(sentences, pad_to_longest=True)
+
+        # Assert
+        self.assertEqual((2, 9), tuple(ids.shape))
+        self._arrays_equal([101, 1045, 3246, 2017, 2031, 4569, 1012, 102, 0], ids[1].numpy())
+        self._arrays_equal([1, 1, 1, 1, 1, 1, 1, 1, 0], masks[1].numpy())
+
     @parameterized.expand([
         ("970 feet", "970", 'feet'),
         ("980 miles", "980", 'miles'),
@@ -117,3 +172,337 @@ class BertTests(unittest.TestCase):
         self.assertEqual(len(a1), len(a2))
         for idx in range(len(a1)):
             self.assertEqual(a1[idx], a2[idx])
+
+
+class SumModel:
+    """
+    Stands in for CBert: one logit row per sentence, the sum of its unmasked ids and the row length.
+    """
+    def __init__(self):
+        self.batch_sizes = []
+
+    def predict(self, input_ids, input_mask):
+        self.batch_sizes.append(input_ids.shape[0])
+        sums = (input_ids * input_mask).sum(dim=1, keepdim=True).double()
+        counts = input_mask.sum(dim=1, keepdim=True).double()
+        return torch.cat([sums, counts], dim=1).numpy()
+
+
+class BatchingPredictorTests(unittest.TestCase):
+    def setUp(self):
+        self.model = SumModel()
+
+    def _predict_concurrently(self, batcher, sentences):
+        results = [None] * len(sentences)
+
+        def run(idx):
+            ids = torch.tensor([sentences[idx]])
+            results[idx] = batcher.predict(ids, torch.ones_like(ids))
+
+        threads = [threading.Thread(target=run, args=(idx,)) for idx in range(len(sentences))]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        return results
+
+    def test_single_request_matches_model(self):
+        # Arrange
+        batcher = BatchingPredictor(MockLogger(), self.model, 8, 1.0)
+        ids = torch.tensor([[101, 5, 6, 102]])
+
+        # Act
+        logits = batcher.predict(ids, torch.ones_like(ids))
+
+        # Assert
+        self.assertEqual([[214.0, 4.0]], logits.tolist())
+
+    def test_concurrent_requests_share_a_batch(self):
+        # Arrange
+        batcher = BatchingPredictor(MockLogger(), self.model, 4, 200.0)
+        sentences = [[101, idx, 102] for idx in range(4)]
+
+        # Act
+        results = self._predict_concurrently(batcher, sentences)
+
+        # Assert
+        self.assertEqual([4], self.model.batch_sizes)
+        for idx, logits in enumerate(results):
+            self.assertEqual([[203.0 + idx, 3.0]], logits.tolist())
+
+    def test_shorter_sentences_are_padded(self):
+        # Arrange
+        batcher = BatchingPredictor(MockLogger(), self.model, 2, 200.0)
+        sentences = [[101, 7, 102], [101, 7, 8, 9, 102]]
+
+        # Act
+        results = self._predict_concurrently(batcher, sentences)
+
+        # Assert
+        self.assertEqual([[210.0, 3.0]], results[0].tolist())
+        self.assertEqual([[227.0, 5.0]], results[1].tolist())
+
+    def test_batch_size_histogram(self):
+        # Arrange
+        batcher = BatchingPredictor(MockLogger(), self.model, 2, 200.0)
+        sentences = [[101, idx, 102] for idx in range(4)]
+
+        # Act
+        self._predict_concurrently(batcher, sentences)
+
+        # Assert
+        status = batcher.get_status()
+        self.assertEqual(2, status["batches"])
+        self.assertEqual(2, status["batch_size_histogram"]["<=2"])
+
+
+class LengthBucketTests(unittest.TestCase):
+    def test_trim_padding_keeps_longest_sentence(self):
+        # Arrange
+        ids = torch.tensor([[101, 5, 102, 0, 0], [101, 5, 6, 102, 0]])
+        mask = (ids != 0).long()
+
+        # Act
+        trimmed_ids, trimmed_mask = trim_padding(ids, mask)
+
+        # Assert
+        self.assertEqual([[101, 5, 102, 0], [101, 5, 6, 102]], trimmed_ids.tolist())
+        self.assertEqual([[1, 1, 1, 0], [1, 1, 1, 1]], trimmed_mask.tolist())
+
+    def test_sampler_groups_similar_lengths(self):
+        # Arrange
+        lengths = [3, 60, 4, 61, 62]
+        sampler = LengthBucketSampler(lengths, 2)
+
+        # Act
+        batches = list(sampler)
+
+        # Assert
+        self.assertEqual(3, len(sampler))
+        self.assertEqual([[0, 2], [1, 3], [4]], sorted(sorted(b) for b in batches))
+
+    def test_sampler_batches_change_between_epochs(self):
+        # Arrange
+        torch.manual_seed(0)
+        sampler = LengthBucketSampler(range(100), 4, pool_batches=5)
+
+        # Act
+        first = list(sampler)
+        second = list(sampler)
+
+        # Assert
+        self.assertEqual(25, len(sampler))
+        self.assertEqual(25, len(first))
+        self.assertEqual(list(range(100)), sorted(idx for b in first for idx in b))
+        self.assertNotEqual({frozenset(b) for b in first}, {frozenset(b) for b in second})
+
+
+def save_tiny_bert(models_dir, version, num_labels):
+    # A small randomly initialised model in the layout CBert.save_model writes
+    torch.manual_seed(0)
+    config = BertConfig(vocab_size=200, hidden_size=32, num_hidden_layers=2, num_attention_heads=2,
+                        intermediate_size=64, num_labels=num_labels)
+    model = BertForSequenceClassification(config)
+    model_dir = os.path.join(models_dir, f"bert_{version}")
+    os.makedirs(model_dir)
+    torch.save(model.state_dict(), model_dir + "/model.pk")
+    with open(model_dir + "/config.pkl", 'wb') as handle:
+        pickle.dump(config, handle, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+class CBertTests(unittest.TestCase):
+    def setUp(self):
+        self.lgr = MockLogger()
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.models_dir = self.tmp_dir.name
+        save_tiny_bert(self.models_dir, "test", 3)
+        torch.manual_seed(1)
+        self.input_ids = torch.randint(1, 200, (6, 16))
+        self.input_mask = torch.ones_like(self.input_ids)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_restored_model_is_frozen(self):
+        # Arrange
+
+        # Act
+        cbert = CBert(self.lgr, 3, self.models_dir, "test")
+
+        # Assert
+        self.assertFalse(any(p.requires_grad for p in cbert._model.parameters()))
+
+    def test_validation_split_same_on_every_split(self):
+        # Arrange
+        input_ids = torch.randint(1, 200, (20, 16))
+        mask = torch.ones_like(input_ids)
+        labels = list(range(20))
+        trained = CBert(self.lgr, 3, self.models_dir, "test")
+        restored = CBert(self.lgr, 3, self.models_dir, "test")
+        torch.manual_seed(7)
+
+        # Act
+        trained.split_datasets(input_ids, mask, labels)
+        restored.split_datasets(input_ids, mask, labels)
+
+        # Assert
+        self.assertEqual(trained._validation_dataloader.dataset.indices,
+                         restored._validation_dataloader.dataset.indices)
+
+    def test_int8_backend_quantizes_linear_layers(self):
+        # Arrange
+
+        # Act
+        cbert = CBert(self.lgr, 3, self.models_dir, "test", backend="int8")
+
+        # Assert
+        module_types = {type(m) for m in cbert._model.modules()}
+        self.assertNotIn(torch.nn.Linear, module_types)
+        self.assertTrue(any("quantized.dynamic" in t.__module__ for t in module_types))
+
+    def test_int8_logits_close_to_fp32(self):
+        # Arrange
+        fp32 = CBert(self.lgr, 3, self.models_dir, "test")
+        int8 = CBert(self.lgr, 3, self.models_dir, "test", backend="int8")
+
+        # Act
+        fp32_logits = fp32.predict(self.input_ids, self.input_mask)
+        int8_logits = int8.predict(self.input_ids, self.input_mask)
+
+        # Assert
+        self.assertEqual(fp32_logits.shape, int8_logits.shape)
+        self.assertLess(np.abs(fp32_logits - int8_logits).max(), 0.1)
+
+    def test_quantized_accuracy_on_validation_split(self):
+        # Arrange
+        cbert = CBert(self.lgr, 3, self.models_dir, "test")
+        input_ids = torch.randint(1, 200, (40, 16))
+        cbert.split_datasets(input_ids, torch.ones_like(input_ids), [idx % 3 for idx in range(40)])
+
+        # Act
+        results = cbert.quantized_accuracy()
+
+        # Assert
+        self.assertEqual({'fp32 Accur.', 'int8 Accur.', 'Agreement'}, set(results.keys()))
+        self.assertGreaterEqual(results['Agreement'], 0.5)
+
+    def test_onnx_logits_match_torch(self):
+        # Arrange
+        cbert = CBert(self.lgr, 3, self.models_dir, "test")
+        cbert.export_onnx()
+
+        # Act
+        onnx_bert = OnnxBert(self.lgr, self.models_dir, "test")
+        onnx_logits = onnx_bert.predict(self.input_ids, self.input_mask)
+
+        # Assert
+        torch_logits = cbert.predict(self.input_ids, self.input_mask)
+        self.assertEqual(torch_logits.shape, onnx_logits.shape)
+        self.assertLess(np.abs(torch_logits - onnx_logits).max(), 1e-4)
+
+    def test_onnx_export_uses_opset_of_pinned_torch(self):
+        # Arrange
+        cbert = CBert(self.lgr, 3, self.models_dir, "test")
+
+        # Act
+        file_name = cbert.export_onnx()
+
+        # Assert
+        # torch 1.9 exports up to opset 13
+        opsets = {o.domain: o.version for o in onnx.load(file_name).opset_import}
+        self.assertEqual(13, opsets[""])
+
+    def test_onnx_int8_model(self):
+        # Arrange
+        cbert = CBert(self.lgr, 3, self.models_dir, "test")
+        cbert.export_onnx(quantize=True)
+
+        # Act
+        onnx_bert = OnnxBert(self.lgr, self.models_dir, "test", quantized=True)
+        onnx_logits = onnx_bert.predict(self.input_ids, self.input_mask)
+
+        # Assert
+        torch_logits = cbert.predict(self.input_ids, self.input_mask)
+        self.assertLess(np.abs(torch_logits - onnx_logits).max(), 0.1)
+
+    def test_torchscript_logits_match_torch(self):
+        # Arrange
+        fp32 = CBert(self.lgr, 3, self.models_dir, "test")
+        input_ids = self.input_ids[:5, :12]
+        input_mask = self.input_mask[:5, :12].clone()
+        input_mask[0, 10:] = 0
+
+        # Act
+        traced = CBert(self.lgr, 3, self.models_dir, "test", backend="torchscript")
+        traced_logits = traced.predict(input_ids, input_mask)
+
+        # Assert
+        fp32_logits = fp32.predict(input_ids, input_mask)
+        self.assertLess(np.abs(fp32_logits - traced_logits).max(), 1e-4)
+
+    def test_traced_model_is_cached(self):
+        # Arrange
+        CBert(self.lgr, 3, self.models_dir, "test", backend="torchscript")
+        file_name = os.path.join(self.models_dir, "bert_test", "model.ts")
+        mtime = os.path.getmtime(file_name)
+
+        # Act
+        cbert = CBert(self.lgr, 3, self.models_dir, "test", backend="torchscript")
+        logits = cbert.predict(self.input_ids[:2, :5], self.input_mask[:2, :5])
+
+        # Assert
+        self.assertEqual(mtime, os.path.getmtime(file_name))
+        self.assertEqual((2, 3), logits.shape)
+
+    def test_mapped_model_matches_pickled(self):
+        # Arrange
+        pickled = CBert(self.lgr, 3, self.models_dir, "test")
+        pickled.save_mapped()
+
+        # Act
+        mapped = CBert(self.lgr, 3, self.models_dir, "test")
+
+        # Assert
+        self.assertTrue(os.path.exists(os.path.join(self.models_dir, "bert_test", "model.safetensors")))
+        self.assertFalse(any(p.requires_grad for p in mapped._model.parameters()))
+        self.assertTrue(np.array_equal(pickled.predict(self.input_ids, self.input_mask),
+                                       mapped.predict(self.input_ids, self.input_mask)))
+
+    def test_mapped_model_without_meta_device_matches_pickled(self):
+        # Arrange
+        pickled = CBert(self.lgr, 3, self.models_dir, "test")
+        pickled.save_mapped()
+
+        # Act
+        with mock.patch("DescriptionProcessing.CBERT.CBertModel._builds_on_meta", return_value=False):
+            mapped = CBert(self.lgr, 3, self.models_dir, "test")
+
+        # Assert
+        self.assertTrue(np.array_equal(pickled.predict(self.input_ids, self.input_mask),
+                                       mapped.predict(self.input_ids, self.input_mask)))
+
+    def test_mapped_model_with_missing_weights_rejected(self):
+        # Arrange
+        pickled = CBert(self.lgr, 3, self.models_dir, "test")
+        pickled.save_mapped()
+        file_name = os.path.join(self.models_dir, "bert_test", "model.safetensors")
+        tensors = load_file(file_name)
+        del tensors["classifier.weight"]
+        save_file(tensors, file_name)
+
+        # Act, Assert
+        with self.assertRaises(ValueError):
+            CBert(self.lgr, 3, self.models_dir, "test")
+
+    def test_convert_models(self):
+        # Arrange
+        save_tiny_bert(self.models_dir, "other", ProjectType.num_sectors())
+
+        # Act
+        convert_models(self.lgr, self.models_dir)
+
+        # Assert
+        self.assertTrue(os.path.exists(os.path.join(self.models_dir, "bert_other", "model.safetensors")))
+        self.assertTrue(os.path.exists(os.path.join(self.models_dir, "bert_other", "config.json")))
+        self.assertTrue(os.path.exists(os.path.join(self.models_dir, "bert_other", "model.onnx")))
+        self.assertTrue(os.path.exists(os.path.join(self.models_dir, "bert_other", "model.int8.onnx")))
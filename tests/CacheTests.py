@@ -0,0 +1,155 @@
+import os
+import tempfile
+import time
+import unittest
+from Common.Cache import LRUCache, DiskStore, canonical_key
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class CacheTests(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.tmp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_key_ignores_dict_order(self):
+        # Arrange
+        first = {"length": 100, "lanes": 2}
+        second = {"lanes": 2, "length": 100}
+
+        # Act
+        key1 = canonical_key("v1", first)
+        key2 = canonical_key("v1", second)
+
+        # Assert
+        self.assertEqual(key1, key2)
+        self.assertNotEqual(key1, canonical_key("v2", first))
+
+    def test_least_recently_used_evicted(self):
+        # Arrange
+        cache = LRUCache(2, 60.0, clock=self.clock)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        cache.get("a")
+
+        # Act
+        cache.put("c", 3)
+
+        # Assert
+        self.assertEqual(1, cache.get("a"))
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(3, cache.get("c"))
+        self.assertEqual(1, cache.stats()["evictions"])
+
+    def test_entries_expire(self):
+        # Arrange
+        cache = LRUCache(2, 60.0, clock=self.clock)
+        cache.put("a", 1)
+
+        # Act
+        self.clock.now += 61.0
+
+        # Assert
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(0, cache.stats()["size"])
+
+    def test_hits_and_misses_counted(self):
+        # Arrange
+        cache = LRUCache(2, 60.0, clock=self.clock)
+        cache.put("a", 1)
+
+        # Act
+        cache.get("a")
+        cache.get("b")
+
+        # Assert
+        stats = cache.stats()
+        self.assertEqual(1, stats["hits"])
+        self.assertEqual(1, stats["misses"])
+        self.assertEqual(0.5, stats["hit_rate"])
+
+    def test_disk_tier_shared_between_caches(self):
+        # Arrange
+        LRUCache(2, 60.0, DiskStore(self.tmp_dir.name, 10), self.clock).put("a", (True, 1.5))
+        other = LRUCache(2, 60.0, DiskStore(self.tmp_dir.name, 10), self.clock)
+
+        # Act
+        value = other.get("a")
+
+        # Assert
+        self.assertEqual((True, 1.5), value)
+        self.assertEqual(1, other.stats()["disk_hits"])
+
+    def test_expired_disk_entry_deleted_on_read(self):
+        # Arrange
+        store = DiskStore(self.tmp_dir.name, 10)
+        LRUCache(2, 60.0, store, self.clock).put("a", 1)
+        other = LRUCache(2, 60.0, store, self.clock)
+        self.clock.now += 61.0
+
+        # Act
+        value = other.get("a")
+
+        # Assert
+        self.assertIsNone(value)
+        self.assertEqual([], os.listdir(self.tmp_dir.name))
+
+    def test_disk_tier_keeps_newest_files(self):
+        # Arrange
+        store = DiskStore(self.tmp_dir.name, 3)
+        for idx, key in enumerate(["a", "b", "c", "d"]):
+            store.put(key, 2000.0, idx)
+            os.utime(os.path.join(self.tmp_dir.name, f"{key}.p"), (1000.0 + idx, 1000.0 + idx))
+
+        # Act
+        store.sweep()
+
+        # Assert
+        self.assertIsNone(store.get("a"))
+        self.assertEqual((2000.0, 3), store.get("d"))
+        self.assertEqual(3, len(os.listdir(self.tmp_dir.name)))
+
+    def test_disk_tier_deletes_old_files(self):
+        # Arrange
+        store = DiskStore(self.tmp_dir.name, 10, max_age=60.0)
+        store.put("old", 2000.0, 1)
+        store.put("new", 2000.0, 2)
+        old_time = time.time() - 120.0
+        os.utime(os.path.join(self.tmp_dir.name, "old.p"), (old_time, old_time))
+
+        # Act
+        store.sweep()
+
+        # Assert
+        self.assertIsNone(store.get("old"))
+        self.assertEqual((2000.0, 2), store.get("new"))
+
+    def test_zero_size_disables_cache(self):
+        # Arrange
+        cache = LRUCache(0, 60.0, clock=self.clock)
+
+        # Act
+        cache.put("a", 1)
+
+        # Assert
+        self.assertIsNone(cache.get("a"))
+
+    def test_memory_use_tracked(self):
+        # Arrange
+        cache = LRUCache(1, 60.0, clock=self.clock, size_of=len)
+        cache.put("a", "12345")
+
+        # Act
+        cache.put("b", "12")
+
+        # Assert
+        self.assertEqual(2, cache.stats()["bytes"])
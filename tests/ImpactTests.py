@@ -1,10 +1,48 @@
+import os
+import time
 import unittest
+from unittest import mock
+import numpy as np
 from ImpactPredictor import get_impact_predictor, ImpactPredictor, CO2Predictor
 from Projects.GenericProject import GenericProject
 from Projects.Bridge import Bridge
+from Projects.Railway import Railway
 from tests.Mocks import MockLCA, MockLogger
 
 
+class SlowMockLCA(MockLCA):
+    def get_co2(self, surface_area, project, deadline=None):
+        time.sleep(0.5)
+        return super().get_co2(surface_area, project, deadline)
+
+
+class CountingMockLCA(MockLCA):
+    def __init__(self):
+        super().__init__()
+        self.calls = 0
+        self.factors = "v1"
+
+    def get_co2(self, surface_area, project, deadline=None):
+        self.calls += 1
+        return super().get_co2(surface_area, project, deadline)
+
+    def version(self):
+        return self.factors
+
+
+class LinearMockLCA(CountingMockLCA):
+    def __init__(self):
+        super().__init__()
+        self.batch_calls = 0
+
+    def is_linear(self):
+        return True
+
+    def get_co2_batch(self, amounts, project_class, deadline=None):
+        self.batch_calls += 1
+        return True, 100.0 * np.asarray(amounts, dtype=float)
+
+
 class TestCO2(unittest.TestCase):
     def setUp(self) -> None:
         lca = MockLCA()
@@ -85,6 +123,33 @@ class TestCO2(unittest.TestCase):
         self.assertTrue(ok_b)
         self.assertAlmostEqual(49.15, res_b, places=1)
 
+    def test_batch_matches_single_project(self):
+        # Arrange
+        projects = [Bridge.from_json(self.lgr, {"length": length, "lanes": 2})[1] for length in [100, 200, 5000]]
+        expected = [self.co2.co2_emissions_method_a(p)[1] for p in projects]
+
+        # Act
+        ok, res = self.co2.co2_emissions_method_a_batch(projects)
+
+        # Assert
+        self.assertTrue(ok)
+        self.assertEqual(3, len(res))
+        for idx in range(len(expected)):
+            self.assertAlmostEqual(expected[idx], res[idx], places=6)
+
+    def test_batch_of_generic_projects(self):
+        # Arrange
+        projects = [GenericProject.from_json(self.lgr, {"tons_concrete": 1000.0, "gallons_diesel": 0.0})[1],
+                    GenericProject.from_json(self.lgr, {"tons_concrete": 0.0, "gallons_diesel": 15_000.0})[1]]
+
+        # Act
+        ok, res = self.co2.co2_emissions_method_a_batch(projects)
+
+        # Assert
+        self.assertTrue(ok)
+        self.assertAlmostEqual(242.0, res[0], places=1)
+        self.assertAlmostEqual(168.0, res[1], places=1)
+
 
 class TestImpact(unittest.TestCase):
     def setUp(self) -> None:
@@ -133,3 +198,132 @@ class TestImpact(unittest.TestCase):
         self.assertAlmostEqual(130.68, res_a, places=1)
         # 4800 ft^2 = 446 m^2 => 44600 kG => 49.17
         self.assertAlmostEqual(49.17, res_b, places=1)
+
+    def test_can_calculate_batch(self):
+        # Arrange
+        lca = MockLCA()
+        lgr = MockLogger()
+        ip = ImpactPredictor(lgr, CO2Predictor(lgr, lca))
+        projects = [Railway.from_json(lgr, {"length": length})[1] for length in [1000, 5200]]
+
+        # Act
+        res = ip.get_co2_batch(projects)
+
+        # Assert
+        self.assertEqual(2, len(res))
+        for project, (ok_a, ok_b, res_a, res_b) in zip(projects, res):
+            self.assertTrue(ok_a)
+            self.assertTrue(ok_b)
+            self.assertEqual(ip.get_co2(project), (ok_a, ok_b, res_a, res_b))
+
+    def test_linear_lca_scores_batch_with_one_lookup(self):
+        # Arrange
+        lgr = MockLogger()
+        lca = LinearMockLCA()
+        ip = ImpactPredictor(lgr, CO2Predictor(lgr, lca))
+        single = ImpactPredictor(lgr, CO2Predictor(lgr, MockLCA()))
+        projects = [Bridge.from_json(lgr, {"length": length, "lanes": 2})[1] for length in [100, 200, 300]]
+
+        # Act
+        res = ip.get_co2_batch(projects)
+
+        # Assert
+        self.assertEqual(1, lca.batch_calls)
+        self.assertEqual(0, lca.calls)
+        for project, (ok_a, ok_b, res_a, res_b) in zip(projects, res):
+            self.assertTrue(ok_b)
+            self.assertAlmostEqual(single.get_co2(project)[3], res_b)
+
+    def test_failed_method_a_queues_no_lca_calls(self):
+        # Arrange
+        lgr = MockLogger()
+        lca = CountingMockLCA()
+        ip = ImpactPredictor(lgr, CO2Predictor(lgr, lca))
+        projects = [Bridge.from_json(lgr, {"length": 100, "lanes": 2, "tons_concrete": "x"})[1]]
+
+        # Act
+        with self.assertRaises(Exception):
+            ip.get_co2_batch(projects)
+
+        # Assert
+        self.assertEqual(0, lca.calls)
+
+    def test_slow_lca_times_out(self):
+        # Arrange
+        lgr = MockLogger()
+        co2 = CO2Predictor(lgr, SlowMockLCA())
+        with mock.patch.dict(os.environ, {"LCA_TIMEOUT_SECS": "0.05"}):
+            ip = ImpactPredictor(lgr, co2)
+        _, project = Bridge.from_json(lgr, {"length": 100, "lanes": 2})
+
+        # Act
+        t0 = time.monotonic()
+        ok_a, ok_b, res_a, res_b = ip.get_co2(project)
+        elapsed = time.monotonic() - t0
+
+        # Assert
+        self.assertTrue(ok_a)
+        self.assertAlmostEqual(130.68, res_a, places=1)
+        self.assertFalse(ok_b)
+        self.assertEqual("LCA system timed out", res_b)
+        self.assertLess(elapsed, 0.4)
+
+    def test_request_deadline_limits_batch(self):
+        # Arrange
+        lgr = MockLogger()
+        ip = ImpactPredictor(lgr, CO2Predictor(lgr, SlowMockLCA()))
+        projects = [Bridge.from_json(lgr, {"length": length, "lanes": 2})[1] for length in [100, 200]]
+
+        # Act
+        res = ip.get_co2_batch(projects, deadline=time.monotonic() + 0.05)
+
+        # Assert
+        for ok_a, ok_b, res_a, res_b in res:
+            self.assertTrue(ok_a)
+            self.assertFalse(ok_b)
+
+    def test_repeated_project_is_cached(self):
+        # Arrange
+        lgr = MockLogger()
+        lca = CountingMockLCA()
+        ip = ImpactPredictor(lgr, CO2Predictor(lgr, lca))
+        _, project = Bridge.from_json(lgr, {"length": 100, "lanes": 2})
+        _, same_project = Bridge.from_json(lgr, {"lanes": 2, "length": 100})
+
+        # Act
+        first = ip.get_co2(project)
+        second = ip.get_co2(same_project)
+
+        # Assert
+        self.assertEqual(first, second)
+        self.assertEqual(1, lca.calls)
+        self.assertEqual(1, ip.get_status()["CO2Cache"]["hits"])
+
+    def test_lca_change_invalidates_cache(self):
+        # Arrange
+        lgr = MockLogger()
+        lca = CountingMockLCA()
+        ip = ImpactPredictor(lgr, CO2Predictor(lgr, lca))
+        _, project = Bridge.from_json(lgr, {"length": 100, "lanes": 2})
+        ip.get_co2(project)
+
+        # Act
+        lca.factors = "v2"
+        ip.get_co2(project)
+
+        # Assert
+        self.assertEqual(2, lca.calls)
+
+    def test_failed_results_not_cached(self):
+        # Arrange
+        lgr = MockLogger()
+        with mock.patch.dict(os.environ, {"LCA_TIMEOUT_SECS": "0.05"}):
+            ip = ImpactPredictor(lgr, CO2Predictor(lgr, SlowMockLCA()))
+        _, project = Bridge.from_json(lgr, {"length": 100, "lanes": 2})
+        ip.get_co2(project)
+
+        # Act
+        stats = ip.get_status()["CO2Cache"]
+
+        # Assert
+        self.assertEqual(0, stats["size"])
@@ -0,0 +1,522 @@
+import os
+import tempfile
+import time
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+from EnvironmentalImpact.LCAClientPool import LCAClientPool, LCAUnavailableError
+from EnvironmentalImpact.LCAReferenceCache import LCAReferenceCache
+from EnvironmentalImpact.LCAFactorCache import LCAFactorCache
+from EnvironmentalImpact.LCAConnector import LCAConnector
+from EnvironmentalImpact.LocalLCAConnector import LocalLCAConnector
+from ImpactPredictor import get_lca_connector
+from export_lca_factors import export_lca_factors
+from Projects.Bridge import Bridge
+from Projects.Road import Road
+from Projects.Railway import Railway
+from Projects.GenericProject import GenericProject
+from Common.CircuitBreaker import CircuitBreaker
+from tests.Mocks import MockLogger
+
+
+class FakeClient:
+    def __init__(self, healthy=True):
+        self.healthy = healthy
+        self.finds = []
+
+        self.calculations = 0
+
+    def find(self, model_type, name):
+        self.finds.append(name)
+        return f"ref:{name}"
+
+    def calculate(self, setup):
+        # Climate change result is 100 kg per functional unit
+        self.calculations += 1
+        category = SimpleNamespace(name="Climate change", ref_unit="kg CO2 eq")
+        return SimpleNamespace(impact_results=[SimpleNamespace(impact_category=category, value=100.0 * setup.amount)])
+
+    def dispose(self, result):
+        pass
+
+    def get_descriptors(self, model_type):
+        if not self.healthy:
+            raise ConnectionError("IPC server down")
+        return iter([])
+
+
+class LCAClientPoolTests(unittest.TestCase):
+    def setUp(self):
+        self.lgr = MockLogger()
+        self.created = []
+
+    def _factory(self):
+        c = FakeClient()
+        self.created.append(c)
+        return c
+
+    def _pool(self, pool_size=2, check_interval=60.0):
+        return LCAClientPool(self.lgr, 8080, pool_size, 0.01, check_interval, self._factory)
+
+    def test_client_is_reused(self):
+        # Arrange
+        pool = self._pool()
+
+        # Act
+        with pool.client() as c1:
+            pass
+        with pool.client() as c2:
+            pass
+
+        # Assert
+        self.assertIs(c1, c2)
+        self.assertEqual(1, len(self.created))
+
+    def test_concurrency_is_bounded(self):
+        # Arrange
+        pool = self._pool(pool_size=1)
+
+        # Act
+        with pool.client():
+            # Assert
+            with self.assertRaises(LCAUnavailableError):
+                with pool.client():
+                    pass
+
+    def test_failed_client_is_replaced(self):
+        # Arrange
+        pool = self._pool()
+
+        # Act
+        with self.assertRaises(ConnectionError):
+            with pool.client():
+                raise ConnectionError("calculation failed")
+        with pool.client() as c2:
+            pass
+
+        # Assert
+        self.assertEqual(2, len(self.created))
+        self.assertIs(self.created[1], c2)
+
+    def test_unhealthy_idle_client_is_replaced(self):
+        # Arrange
+        pool = self._pool(check_interval=0.0)
+        with pool.client() as c1:
+            c1.healthy = False
+
+        # Act
+        with pool.client() as c2:
+            pass
+
+        # Assert
+        self.assertIsNot(c1, c2)
+        self.assertEqual(1, pool.idle_count())
+
+
+class LCAReferenceCacheTests(unittest.TestCase):
+    def setUp(self):
+        self.lgr = MockLogger()
+        self.client = FakeClient()
+
+    def _cache(self, ttl=60.0):
+        return LCAReferenceCache(self.lgr, "EF 3.0 Method", {Bridge: "SimpleBridge"}, ttl)
+
+    def test_references_looked_up_once(self):
+        # Arrange
+        cache = self._cache()
+
+        # Act
+        refs1 = cache.get(self.client, Bridge)
+        refs2 = cache.get(self.client, Bridge)
+
+        # Assert
+        self.assertEqual(("ref:EF 3.0 Method", "ref:SimpleBridge"), refs1)
+        self.assertEqual(refs1, refs2)
+        self.assertEqual(2, len(self.client.finds))
+
+    def test_expired_references_looked_up_again(self):
+        # Arrange
+        cache = self._cache(ttl=0.0)
+        cache.get(self.client, Bridge)
+
+        # Act
+        cache.get(self.client, Bridge)
+
+        # Assert
+        self.assertEqual(4, len(self.client.finds))
+
+    def test_invalidate_forces_lookup(self):
+        # Arrange
+        cache = self._cache()
+        cache.get(self.client, Bridge)
+
+        # Act
+        cache.invalidate(Bridge)
+        cache.get(self.client, Bridge)
+
+        # Assert
+        self.assertEqual(4, len(self.client.finds))
+
+    def test_no_product_system_for_unknown_class(self):
+        # Arrange
+        cache = self._cache()
+
+        # Act
+        impact_method, product_system = cache.get(self.client, GenericProject)
+
+        # Assert
+        self.assertEqual("ref:EF 3.0 Method", impact_method)
+        self.assertIsNone(product_system)
+
+
+class LCAFactorTests(unittest.TestCase):
+    def setUp(self):
+        self.lgr = MockLogger()
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.file_name = os.path.join(self.tmp_dir.name, "factors", "lca_factors.json")
+        self.client = FakeClient()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def _connector(self, mode):
+        pool = LCAClientPool(self.lgr, 8080, 1, 0.01, 60.0, lambda: self.client)
+        factors = LCAFactorCache(self.lgr, self.file_name, "EF 3.0 Method")
+        with mock.patch.dict(os.environ, {"LCA_MODE": mode}):
+            return LCAConnector(self.lgr, pool=pool, factors=factors)
+
+    def test_factors_persist(self):
+        # Arrange
+        cache = LCAFactorCache(self.lgr, self.file_name, "EF 3.0 Method")
+
+        # Act
+        cache.set("SimpleBridge", 110.5)
+        reloaded = LCAFactorCache(self.lgr, self.file_name, "EF 3.0 Method")
+
+        # Assert
+        self.assertEqual(110.5, reloaded.get("SimpleBridge"))
+
+    def test_factors_from_other_workers_kept(self):
+        # Arrange
+        worker_1 = LCAFactorCache(self.lgr, self.file_name, "EF 3.0 Method")
+        worker_2 = LCAFactorCache(self.lgr, self.file_name, "EF 3.0 Method")
+
+        # Act
+        worker_1.set("SimpleBridge", 110.5)
+        worker_2.set("Road", 42.0)
+        reloaded = LCAFactorCache(self.lgr, self.file_name, "EF 3.0 Method")
+
+        # Assert
+        self.assertEqual({"SimpleBridge": 110.5, "Road": 42.0}, reloaded.factors())
+
+    def test_factors_for_other_method_ignored(self):
+        # Arrange
+        LCAFactorCache(self.lgr, self.file_name, "EF 3.0 Method").set("SimpleBridge", 110.5)
+
+        # Act
+        reloaded = LCAFactorCache(self.lgr, self.file_name, "ReCiPe 2016")
+
+        # Assert
+        self.assertIsNone(reloaded.get("SimpleBridge"))
+
+    def test_linear_mode_calculates_once(self):
+        # Arrange
+        lca = self._connector("linear")
+        project = Bridge(self.lgr)
+
+        # Act
+        ok1, co2_1 = lca.get_co2(10.0, project)
+        ok2, co2_2 = lca.get_co2(25.0, project)
+
+        # Assert
+        self.assertTrue(ok1 and ok2)
+        self.assertAlmostEqual(1000.0, co2_1)
+        self.assertAlmostEqual(2500.0, co2_2)
+        self.assertEqual(1, self.client.calculations)
+
+    def test_factor_calculation_keeps_deadline(self):
+        # Arrange
+        pool = LCAClientPool(self.lgr, 8080, 1, 5.0, 60.0, lambda: self.client)
+        factors = LCAFactorCache(self.lgr, self.file_name, "EF 3.0 Method")
+        with mock.patch.dict(os.environ, {"LCA_MODE": "linear"}):
+            lca = LCAConnector(self.lgr, pool=pool, factors=factors)
+
+        # Act
+        with pool.client():
+            t0 = time.monotonic()
+            ok, _ = lca.get_co2(10.0, Bridge(self.lgr), deadline=t0 + 0.05)
+            elapsed = time.monotonic() - t0
+
+        # Assert
+        self.assertFalse(ok)
+        self.assertLess(elapsed, 1.0)
+
+    def test_calculate_mode_always_calculates(self):
+        # Arrange
+        lca = self._connector("calculate")
+        project = Bridge(self.lgr)
+
+        # Act
+        lca.get_co2(10.0, project)
+        ok, co2 = lca.get_co2(25.0, project)
+
+        # Assert
+        self.assertTrue(ok)
+        self.assertAlmostEqual(2500.0, co2)
+        self.assertEqual(2, self.client.calculations)
+
+    def test_batch_uses_factor(self):
+        # Arrange
+        lca = self._connector("linear")
+
+        # Act
+        ok, co2 = lca.get_co2_batch([1.0, 2.0, 3.5], Bridge)
+
+        # Assert
+        self.assertTrue(ok)
+        self.assertEqual([100.0, 200.0, 350.0], list(co2))
+
+    def test_exported_factors_serve_local_backend(self):
+        # Arrange
+        lca = self._connector("linear")
+
+        # Act
+        ok = export_lca_factors(self.lgr, lca)
+        local = LocalLCAConnector(self.lgr, LCAFactorCache(self.lgr, self.file_name, "EF 3.0 Method"))
+
+        # Assert
+        self.assertTrue(ok)
+        self.assertTrue(local.prewarm())
+        self.assertEqual((True, 1000.0), local.get_co2(10.0, Bridge(self.lgr)))
+
+    def test_refresh_recalculates_every_system(self):
+        # Arrange
+        lca = self._connector("linear")
+        lca.get_co2(10.0, Bridge(self.lgr))
+
+        # Act
+        ok, err = lca.refresh_factors()
+
+        # Assert
+        self.assertTrue(ok)
+        self.assertEqual(5, self.client.calculations)
+
+    def test_failed_refresh_keeps_factors(self):
+        # Arrange
+        lca = self._connector("linear")
+        lca.get_co2(10.0, Bridge(self.lgr))
+        self.client.calculate = mock.Mock(side_effect=ConnectionError("IPC server down"))
+
+        # Act
+        ok, err = lca.refresh_factors()
+        reloaded = LCAFactorCache(self.lgr, self.file_name, "EF 3.0 Method")
+
+        # Assert
+        self.assertFalse(ok)
+        self.assertEqual(4, len(err))
+        self.assertEqual(100.0, reloaded.get("SimpleBridge"))
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class CircuitBreakerTests(unittest.TestCase):
+    def setUp(self):
+        self.lgr = MockLogger()
+        self.clock = FakeClock()
+        self.breaker = CircuitBreaker(2, 30.0, self.clock)
+        self.client = FakeClient()
+        self.failing = False
+
+    def _client_factory(self):
+        if self.failing:
+            raise ConnectionError("LCA system down")
+        return self.client
+
+    def _connector(self):
+        pool = LCAClientPool(self.lgr, 8080, 1, 0.01, 60.0, self._client_factory)
+        with mock.patch.dict(os.environ, {"LCA_MODE": "calculate"}):
+            return LCAConnector(self.lgr, pool=pool, breaker=self.breaker)
+
+    def test_opens_after_consecutive_failures(self):
+        # Arrange
+        self.breaker.record_failure()
+
+        # Act
+        allowed_before = self.breaker.allow()
+        self.breaker.record_failure()
+        allowed_after = self.breaker.allow()
+
+        # Assert
+        self.assertTrue(allowed_before)
+        self.assertFalse(allowed_after)
+        self.assertEqual({"state": "open", "consecutive_failures": 2, "trips": 1, "rejected": 1},
+                         self.breaker.status())
+
+    def test_success_resets_failures(self):
+        # Arrange
+        self.breaker.record_failure()
+
+        # Act
+        self.breaker.record_success()
+        self.breaker.record_failure()
+
+        # Assert
+        self.assertTrue(self.breaker.allow())
+
+    def test_half_open_lets_one_probe_through(self):
+        # Arrange
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.clock.now = 31.0
+
+        # Act
+        probe = self.breaker.allow()
+        second = self.breaker.allow()
+
+        # Assert
+        self.assertTrue(probe)
+        self.assertFalse(second)
+        self.assertEqual("half_open", self.breaker.status()["state"])
+
+    def test_failed_probe_reopens(self):
+        # Arrange
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.clock.now = 31.0
+        self.breaker.allow()
+
+        # Act
+        self.breaker.record_failure()
+
+        # Assert
+        self.assertFalse(self.breaker.allow())
+        self.assertEqual(2, self.breaker.status()["trips"])
+
+    def test_skipped_probe_lets_next_call_probe(self):
+        # Arrange
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.clock.now = 31.0
+        self.breaker.allow()
+
+        # Act
+        self.breaker.record_skipped()
+
+        # Assert
+        self.assertTrue(self.breaker.allow())
+        self.assertEqual(1, self.breaker.status()["trips"])
+
+    def test_busy_pool_does_not_open_breaker(self):
+        # Arrange
+        lca = self._connector()
+        project = Bridge(self.lgr)
+
+        # Act
+        with lca._pool.client():
+            results = [lca.get_co2(10.0, project) for _ in range(3)]
+
+        # Assert
+        self.assertTrue(all(not ok for ok, _ in results))
+        self.assertEqual({"state": "closed", "consecutive_failures": 0, "trips": 0, "rejected": 0},
+                         self.breaker.status())
+
+    def test_connector_fails_fast_when_open(self):
+        # Arrange
+        lca = self._connector()
+        project = Bridge(self.lgr)
+        self.failing = True
+        lca.get_co2(10.0, project)
+        lca.get_co2(10.0, project)
+        self.failing = False
+
+        # Act
+        ok, err = lca.get_co2(10.0, project)
+
+        # Assert
+        self.assertFalse(ok)
+        self.assertEqual("LCA system unavailable", err)
+        self.assertEqual(0, self.client.calculations)
+
+    def test_connector_recovers_after_reset(self):
+        # Arrange
+        lca = self._connector()
+        project = Bridge(self.lgr)
+        self.failing = True
+        lca.get_co2(10.0, project)
+        lca.get_co2(10.0, project)
+        self.failing = False
+        self.clock.now = 31.0
+
+        # Act
+        ok, co2 = lca.get_co2(10.0, project)
+
+        # Assert
+        self.assertTrue(ok)
+        self.assertAlmostEqual(1000.0, co2)
+        self.assertEqual("closed", lca.get_status()["circuit_breaker"]["state"])
+
+
+class LocalLCAConnectorTests(unittest.TestCase):
+    def setUp(self):
+        self.lgr = MockLogger()
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.file_name = os.path.join(self.tmp_dir.name, "lca_factors.json")
+        factors = LCAFactorCache(self.lgr, self.file_name, "EF 3.0 Method")
+        factors.set("SimpleBridge", 110.5)
+        factors.set("Road", 20.0)
+        with mock.patch.dict(os.environ, {"LCA_FACTOR_FILE": self.file_name}):
+            self.lca = LocalLCAConnector(self.lgr)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_co2_from_factor_table(self):
+        # Arrange
+        project = Bridge(self.lgr)
+
+        # Act
+        ok, co2 = self.lca.get_co2(10.0, project)
+
+        # Assert
+        self.assertTrue(ok)
+        self.assertAlmostEqual(1105.0, co2)
+
+    def test_missing_factor_is_an_error(self):
+        # Arrange
+        project = Railway(self.lgr)
+
+        # Act
+        ok, err = self.lca.get_co2(10.0, project)
+
+        # Assert
+        self.assertFalse(ok)
+        self.assertEqual("No local LCA factor for Railway", err)
+        self.assertFalse(self.lca.prewarm())
+
+    def test_batch_is_vectorized(self):
+        # Arrange
+        amounts = [1.0, 2.0, 4.0]
+
+        # Act
+        ok, co2 = self.lca.get_co2_batch(amounts, Road)
+
+        # Assert
+        self.assertTrue(ok)
+        self.assertEqual([20.0, 40.0, 80.0], list(co2))
+
+    def test_selected_by_config(self):
+        # Arrange
+        env = {"LCA_BACKEND": "local", "LCA_FACTOR_FILE": self.file_name}
+
+        # Act
+        with mock.patch.dict(os.environ, env):
+            lca = get_lca_connector(self.lgr)
+
+        # Assert
+        self.assertIsInstance(lca, LocalLCAConnector)
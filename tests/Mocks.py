@@ -6,9 +6,18 @@ class MockLCA(LCAConnector):
     def __init__(self):
         pass
 
-    def get_co2(self, surface_area, project):
+    def get_co2(self, surface_area, project, deadline=None):
         return True, 100.0 * surface_area
 
+    def get_status(self):
+        return {}
+
+    def version(self):
+        return "mock"
+
+    def is_linear(self):
+        return False
+
 
 class MockPrediction:
     def __init__(self):
@@ -1,4 +1,5 @@
 import unittest
+import numpy as np
 from parameterized import parameterized
 from Projects.Energy import Energy
 from Projects.Bridge import Bridge
@@ -118,4 +119,42 @@ class ProjectBuilderTests(unittest.TestCase):
 
         # Assert
         self.assertFalse(ok)
-        self.assertTrue("'project_type' required and must be one of" in p)
\ No newline at end of file
+        self.assertTrue("'project_type' required and must be one of" in p)
+
+    def test_can_calculate_batch(self):
+        # Arrange
+        columns = {"length": [100, 2500, 1000], "lanes": np.array([2, 2, 4])}
+
+        # Act
+        ok, res = self.pb.calculate_batch("Bridges", columns)
+
+        # Assert
+        self.assertTrue(ok)
+        np.testing.assert_allclose([4800.0, 120_000.0, 96_000.0], res["surface_area"])
+        np.testing.assert_allclose([540.0, 13_500.0, 10_800.0], res["tons_concrete"])
+
+    def test_batch_uses_defaults_for_missing_columns(self):
+        # Arrange
+        columns = {"length": [100, 200]}
+
+        # Act
+        ok, res = self.pb.calculate_batch("Bridges", columns)
+
+        # Assert
+        self.assertTrue(ok)
+        np.testing.assert_allclose([96.0, 96.0], res["width"])
+
+    @parameterized.expand([
+        ("unknown type", "Buildings", {"length": [100]}),
+        ("unknown param", "Bridges", {"height": [100]}),
+        ("mismatched lengths", "Bridges", {"length": [100, 200], "lanes": [2]}),
+        ("empty", "Bridges", {}),
+    ])
+    def test_cannot_calculate_bad_batch(self, name, proj_type, columns):
+        # Arrange
+
+        # Act
+        ok, err = self.pb.calculate_batch(proj_type, columns)
+
+        # Assert
+        self.assertFalse(ok)
@@ -0,0 +1,90 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+import torch
+from Common.Cache import LRUCache
+from ProjectPredictor import ProjectPredictor, weights_version
+from Projects.ProjectBuilder import ProjectBuilder
+from Projects.ProjectTypes import ProjectType
+from tests.Mocks import MockLogger, MockDescriptionParser
+
+
+class MockPreprocessor:
+    def preprocess_data(self, sentences, pad_to_longest=False):
+        ids = torch.ones((len(sentences), 4), dtype=torch.long)
+        return ids, torch.ones_like(ids)
+
+
+class CountingClassifier:
+    def __init__(self):
+        self.calls = 0
+
+    def predict(self, input_ids, input_mask):
+        self.calls += 1
+        logits = np.zeros((input_ids.shape[0], ProjectType.num_sectors()))
+        logits[:, 0] = 2.0
+        logits[:, 1] = 1.0
+        return logits
+
+    def get_status(self):
+        return {}
+
+
+class ProjectPredictorTests(unittest.TestCase):
+    def setUp(self):
+        self.lgr = MockLogger()
+        self.classifier = CountingClassifier()
+        pb = ProjectBuilder(self.lgr, MockDescriptionParser())
+        self.pp = ProjectPredictor(self.lgr, MockPreprocessor(), self.classifier, pb, LRUCache(8, 60.0), "test")
+
+    def test_repeated_description_is_cached(self):
+        # Arrange
+        first = self.pp.find_project_from_description("A new bridge over the river")
+
+        # Act
+        second = self.pp.find_project_from_description("  a new  BRIDGE over the river ")
+
+        # Assert
+        self.assertEqual(first, second)
+        self.assertEqual(1, self.classifier.calls)
+        self.assertEqual(1, self.pp.get_status()["BERTCache"]["hits"])
+
+    def test_different_description_is_predicted(self):
+        # Arrange
+        self.pp.find_project_from_description("A new bridge over the river")
+
+        # Act
+        self.pp.find_project_from_description("Widen the highway to four lanes")
+
+        # Assert
+        self.assertEqual(2, self.classifier.calls)
+
+    def test_given_sector_skips_classifier(self):
+        # Arrange
+        sector = list(ProjectType.__members__.keys())[0]
+
+        # Act
+        results = self.pp.find_project_from_description("A new bridge", sector)
+
+        # Assert
+        self.assertEqual([sector], list(results.keys()))
+        self.assertEqual(0, self.classifier.calls)
+
+    def test_retrained_weights_change_version(self):
+        # Arrange
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            weights_file = os.path.join(tmp_dir, "model.safetensors")
+            with open(weights_file, "wb") as out_file:
+                out_file.write(b"weights")
+            before = weights_version(weights_file, "fp32")
+            unchanged = weights_version(weights_file, "fp32")
+
+            # Act
+            retrained_at = os.stat(weights_file).st_mtime_ns + 1_000_000_000
+            os.utime(weights_file, ns=(retrained_at, retrained_at))
+            after = weights_version(weights_file, "fp32")
+
+        # Assert
+        self.assertEqual(before, unchanged)
+        self.assertNotEqual(before, after)
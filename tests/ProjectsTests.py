@@ -119,6 +119,44 @@ class ProjectsTests(unittest.TestCase):
         self.assertAlmostEqual(width, p.get_param_value(WIDTH), places=1)
         self.assertAlmostEqual(surface_area, p.get_param_value(SURFACE_AREA), places=1)
 
+    def test_bridges_share_plan_not_values(self):
+        # Arrange
+        params = {"name": "GenericBridge", "length": 100, "lanes": 2}
+        _, p1 = Bridge.from_json(self.lgr, params)
+
+        # Act
+        p2 = Bridge(self.lgr)
+
+        # Assert
+        self.assertIs(p1.PLAN, p2.PLAN)
+        self.assertAlmostEqual(4800.0, p1.get_param_value(SURFACE_AREA), places=1)
+        self.assertAlmostEqual(96_000.0, p2.get_param_value(SURFACE_AREA), places=1)
+
+    def test_set_param_recalculates_dependents(self):
+        # Arrange
+        params = {"name": "GenericBridge", "length": 100, "lanes": 2}
+        _, p = Bridge.from_json(self.lgr, params)
+
+        # Act
+        ok, err = p.set_param_value(LENGTH, 2500)
+
+        # Assert
+        self.assertTrue(ok)
+        self.assertAlmostEqual(48.0, p.get_param_value(WIDTH), places=1)
+        self.assertAlmostEqual(120_000.0, p.get_param_value(SURFACE_AREA), places=1)
+        self.assertAlmostEqual(13_500.0, p.get_param_value(TONS_CONCRETE), places=1)
+
+    def test_set_unknown_param_fails(self):
+        # Arrange
+        p = Bridge(self.lgr)
+
+        # Act
+        ok, err = p.set_param_value("height", 10)
+
+        # Assert
+        self.assertFalse(ok)
+        self.assertEqual(1, len(err))
+
     def test_values_not_overwritten_when_not_specified(self):
         # Arrange
         params = {"name": "GenericBridge", "length": 100, "lanes": 2, "width": 17}
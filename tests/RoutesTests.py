@@ -70,6 +70,53 @@ class RouteTests(unittest.TestCase):
         json_res = rv.json
         assert "Sector" in json_res
 
+    def test_post_co2_batch_with_object_errors(self):
+        # Arrange
+        json_dict = {"project_type": "bridges", "length": 100, "lanes": 2}
+
+        # Act
+        rv = self.client.post("/api/project/co2/batch", json=json_dict)
+
+        # Assert
+        assert 400 == rv.status_code
+        self._validate_error_response(rv.json, "Request body must be a list of projects.")
+
+    def test_post_co2_batch_reports_per_item_results(self):
+        # Arrange
+        json_list = [
+            {"project_type": "bridges", "length": 100, "lanes": 2},
+            {"project_type": "buildings"},
+            {"project_type": "bridges", "length": 200, "lanes": 4},
+        ]
+
+        # Act
+        rv = self.client.post("/api/project/co2/batch", json=json_list)
+
+        # Assert
+        assert 200 == rv.status_code
+        results = rv.json["Results"]
+        assert 3 == len(results)
+        assert "CO2 Method 1" in results[0]
+        assert "ErrorMsg" in results[1]
+        assert "CO2 Method 1" in results[2]
+
+    def test_post_co2_batch_reports_invalid_parameter_per_item(self):
+        # Arrange
+        json_list = [
+            {"project_type": "bridges", "length": 100, "lanes": 2},
+            {"project_type": "bridges", "length": "abc", "lanes": 2},
+        ]
+
+        # Act
+        rv = self.client.post("/api/project/co2/batch", json=json_list)
+
+        # Assert
+        assert 200 == rv.status_code
+        results = rv.json["Results"]
+        assert 2 == len(results)
+        assert "CO2 Method 1" in results[0]
+        assert "ErrorMsg" in results[1]
+
     @staticmethod
     def _validate_error_response(json_resp, msg):
         assert 1 == len(json_resp)
@@ -1,6 +1,6 @@
 import unittest
 from parameterized import parameterized
-from RulesEngine.RulesEngine import RulesEngine, Fact, Rule
+from RulesEngine.RulesEngine import RulesEngine, Fact, Rule, RuleError, RuleGraph
 
 
 class FactsTests(unittest.TestCase):
@@ -146,6 +146,22 @@ class FactsTests(unittest.TestCase):
         self.assertEqual("B", res[0])
         self.assertEqual("C", res[1])
 
+    def test_can_find_fact_among_many(self):
+        # Arrange
+        e = RulesEngine()
+        for idx in range(1000):
+            e.add_fact(Fact("has_value", f"var_{idx}", idx))
+        e.add_fact(Fact("is_bigger", "B", "A"))
+        e.add_fact(Fact("is_bigger", "D", "A"))
+
+        # Act
+        res = e.query("has_value", "var_500")
+        res_post = e.query_post("is_bigger", "A")
+
+        # Assert
+        self.assertEqual([500], res)
+        self.assertEqual(["B", "D"], res_post)
+
 
 class RulesTests(unittest.TestCase):
     def setUp(self):
@@ -191,3 +207,122 @@ class RulesTests(unittest.TestCase):
         # Assert
         self.assertEqual(1, len(res))
         self.assertEqual(20.0, res[0])
+
+    def test_calculated_value_not_duplicated(self):
+        # Arrange
+        e = RulesEngine()
+        e.add_fact(Fact("has_value", "lanes", 4))
+        e.add_fact(Fact("has_value", "lane_width", 10))
+        e.add_rule(Rule("width = lanes * lane_width"))
+        e.query("has_value", "width")
+
+        # Act
+        res = e.query("has_value", "width")
+
+        # Assert
+        self.assertEqual([40], res)
+        self.assertEqual(2, e.fact_count())
+
+    def test_fact_overrides_rule_for_dependents(self):
+        # Arrange
+        e = RulesEngine()
+        e.add_fact(Fact("has_value", "lanes", 4))
+        e.add_fact(Fact("has_value", "lane_width", 10))
+        e.add_fact(Fact("has_value", "depth", 0.5))
+        e.add_fact(Fact("has_value", "width", 17))
+        e.add_rule(Rule("width = lanes * lane_width"))
+        e.add_rule(Rule("volume = width * depth"))
+
+        # Act
+        res = e.query("has_value", "volume")
+
+        # Assert
+        self.assertEqual([8.5], res)
+
+    def test_recalculates_when_fact_added(self):
+        # Arrange
+        e = RulesEngine()
+        e.add_fact(Fact("has_value", "lanes", 4))
+        e.add_rule(Rule("width = lanes * lane_width"))
+        e.add_fact(Fact("has_value", "lane_width", 10))
+        e.query("has_value", "width")
+
+        # Act
+        e.add_fact(Fact("has_value", "width", 17))
+        res = e.query("has_value", "width")
+
+        # Assert
+        self.assertEqual([17, 40], res)
+
+    def test_undefined_variable_detected(self):
+        # Arrange
+        e = RulesEngine()
+        e.add_fact(Fact("has_value", "lanes", 4))
+        e.add_rule(Rule("width = lanes * lane_width"))
+
+        # Act
+
+        # Assert
+        with self.assertRaises(RuleError):
+            e.compile()
+
+    def test_cycle_detected(self):
+        # Arrange
+        e = RulesEngine()
+        e.add_fact(Fact("has_value", "depth", 0.5))
+        e.add_rule(Rule("width = volume / depth"))
+        e.add_rule(Rule("volume = width * depth"))
+
+        # Act
+
+        # Assert
+        with self.assertRaises(RuleError):
+            e.query("has_value", "volume")
+
+    def test_downstream_only_recalculated(self):
+        # Arrange
+        rules = [Rule("width = lanes * lane_width"),
+                 Rule("area = length * width"),
+                 Rule("volume = area * depth"),
+                 Rule("paint = lanes * 2")]
+        graph = RuleGraph(rules, ["lanes", "lane_width", "length", "depth"])
+        scope = {"lanes": 2, "lane_width": 10, "length": 100, "depth": 0.5}
+        for name, vals in graph.evaluate(scope).items():
+            scope[name] = vals[0]
+
+        # Act
+        scope["length"] = 200
+        dirty = graph.recalculate(scope, ["length"], set())
+
+        # Assert
+        self.assertEqual(["area", "volume"], dirty)
+        self.assertEqual(4000, scope["area"])
+        self.assertEqual(2000.0, scope["volume"])
+
+    @parameterized.expand([
+        ("call", "width = __import__('os').getcwd()"),
+        ("attribute", "width = lanes.__class__"),
+        ("string", "width = 'wide'"),
+        ("comparison", "width = lanes > 2"),
+        ("not a rule", "width + lanes"),
+        ("bad syntax", "width = (lanes * 2"),
+    ])
+    def test_unsafe_rules_rejected(self, name, rule_text):
+        # Arrange
+
+        # Act
+
+        # Assert
+        with self.assertRaises(RuleError):
+            Rule(rule_text)
+
+    def test_rules_share_compiled_expression(self):
+        # Arrange
+        r1 = Rule("width = lanes * lane_width")
+
+        # Act
+        r2 = Rule("width = lanes * lane_width")
+
+        # Assert
+        self.assertIs(r1._code, r2._code)
+        self.assertEqual(("lanes", "lane_width"), r2.variables)
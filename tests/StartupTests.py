@@ -0,0 +1,48 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Only used to train or plot, serving must not pay for importing them
+TRAINING_ONLY = ("matplotlib", "seaborn", "pandas", "tensorflow")
+
+# Runs in a fresh interpreter so modules already imported by other tests don't hide a regression
+_SERVING_IMPORTS = """
+import json, sys, time
+start = time.perf_counter()
+import app
+from DescriptionProcessing.CBERT.CBertModel import CBert
+from Common.gpu import check_for_GPU
+check_for_GPU()
+elapsed = time.perf_counter() - start
+print(json.dumps({"imported": [m for m in %r if m in sys.modules], "secs": elapsed}))
+""" % (TRAINING_ONLY,)
+
+
+class StartupTests(unittest.TestCase):
+    def setUp(self):
+        # An empty tensorflow package shows up in sys.modules if anything imports it, installed or not
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        os.mkdir(os.path.join(self.tmp_dir.name, "tensorflow"))
+        open(os.path.join(self.tmp_dir.name, "tensorflow", "__init__.py"), "w").close()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_serving_imports_skip_training_libraries(self):
+        # Arrange
+        python_path = os.pathsep.join([self.tmp_dir.name, REPO_DIR, os.environ.get("PYTHONPATH", "")])
+        env = dict(os.environ, HF_HUB_OFFLINE="1", PYTHONPATH=python_path)
+
+        # Act
+        out = subprocess.run([sys.executable, "-c", _SERVING_IMPORTS], cwd=REPO_DIR, env=env,
+                             capture_output=True, text=True, timeout=300)
+
+        # Assert
+        self.assertEqual(0, out.returncode, out.stderr)
+        result = json.loads(out.stdout.strip().splitlines()[-1])
+        self.assertEqual([], result["imported"], f"Serving imports took {result['secs']:.2f}s")